@@ -2,39 +2,90 @@
 import streamlit as st
 import pandas as pd
 import math as mt
-from scipy.integrate import odeint
-import numpy as np
+import contextlib
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import calculs
+import catalogue
+import demarrage
+import medias
+import metriques
+import profilage
 from streamlit.logger import get_logger
+import solveurs
+from cache_resultats import CACHE, en_cache
+from decimation import decimer
+from solveurs import vitesse_pente, vitesse_piste
+from tour import Tour
+
+# Les solveurs avec frottements sont partagés entre sessions par le cache sur disque ;
+# les versions sans frottements sont plus rapides à recalculer qu'à relire
+vitesse_pente_frottement = en_cache(solveurs.vitesse_pente_frottement)
+vitesse_piste_frottement = en_cache(solveurs.vitesse_piste_frottement)
 
 LOGGER = get_logger(__name__)
 
 
+@st.cache_resource
+def prechauffer_serveur():
+    # Une seule fois par serveur, en arrière-plan : les imports différés et le premier tour de circuit
+    # (et la compilation Numba avec PRECHAUFFAGE_NOYAUX=1) ne sont pas payés par le premier utilisateur
+    if not demarrage.PRECHAUFFAGE:
+        return None
+    if calculs.PROCESSUS > 0:
+        threading.Thread(target=calculs.POOL.demarrer, daemon=True).start()
+    thread = threading.Thread(target=demarrage.prechauffer, daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource
+def demarrer_metriques():
+    # Export Prometheus des mesures par segment, si demandé (METRIQUES_FICHIER, METRIQUES_PORT)
+    if metriques.FICHIER:
+        metriques.exporter(metriques.FICHIER)
+    return metriques.servir(metriques.PORT, metriques.HOTE) if metriques.PORT else None
+
+
+@st.fragment(run_every=5)
+def panneau_metriques():
+    # Réservé à l'administration (METRIQUES_ADMIN=1) : percentiles des derniers calculs de ce serveur
+    st.subheader("Mesures par segment")
+    lignes = metriques.REGISTRE.instantane()
+    if lignes:
+        st.dataframe(pd.DataFrame(lignes), hide_index=True)
+    else:
+        st.caption("Aucun segment calculé pour l'instant.")
+
+
 def run():
     st.set_page_config(
         page_title="Livrable 3",
         page_icon="🚗",
     )
+    prechauffer_serveur()
+    demarrer_metriques()
 
 
     progress_text = "Calcul en cours..."
 
-    # Chargement des données depuis le fichier CSV
-    data = pd.read_csv('caracteristiques_voitures.csv')
+    # Catalogue des voitures, relu seulement si le fichier CSV a changé
+    voitures = catalogue.charger()
 
     # Mise en page de l'application Streamlit
     st.title("Calculateur de vitesse de voiture")
 
-    st.image("circuit.png", caption='Shéma du circuit')
+    st.image(medias.lire("circuit"), caption='Shéma du circuit')
     st.divider()
 
     # Sélection du modèle de voiture à partir du fichier CSV
-    modele_voiture = st.selectbox("Sélectionnez le modèle de voiture :", data['Nom'].tolist())
+    modele_voiture = st.selectbox("Sélectionnez le modèle de voiture :", voitures.noms)
 
     # Affichage des caractéristiques du modèle sélectionné
-    caracteristiques = data[data['Nom'] == modele_voiture].squeeze()
+    voiture = voitures[modele_voiture]
     st.subheader("▪ Caractéristiques du modèle sélectionné :")
-    st.dataframe(caracteristiques, width=350)
-    print(caracteristiques)
+    st.dataframe(pd.Series(voiture.fiche(), name=voiture.nom), width=350)
+    LOGGER.debug("Voiture sélectionnée : %r", voiture)
     st.divider()
 
     # Liste déroulante pour choisir la partie du circuit à simuler
@@ -71,211 +122,63 @@ def run():
     frottements = st.toggle("Faire avec frottements")
 
     # FONCTION :
-    def vitesse_pente(g, masse, acceleration):
-        OM = 0
-        t = 0
-        while OM < 31:
-            OM = 0.5 * (g * mt.sin(mt.radians(3.699)) + acceleration ) * t**2
-            t = t + 0.001
-            #print(OM)
-        #print(t)
-        v = (g * mt.sin(mt.radians(3.699)) +  acceleration ) * t
-        return v,t
-
-    def vitesse_pente_frottement(g, masse, acceleration, l, L, h, Cx):
-        v = 0
-        t=0
-        OM = 0
-        dt = 0.00001
-        Surface = L*h
-        k = 0.5 * (1.225 * Surface * Cx)
-        while OM < 31:
-            v += (g * mt.sin(mt.radians(3.699)) + acceleration - ((k * v**2) / masse)  - (0.1 * (g * mt.sin(mt.radians(3.699)))) ) * dt
-            # print (v, OM)
-            OM += v * dt
-            t += dt
-        return v,t
-
-    def systeme_equations(y, t, m, g, r, F):
-        try:
-            dydt = [y[1],
-                    (-m * g * np.sin(y[0]) - 0.5 * (r * y[1] ** 2) - (r * (y[1] ** 2)) + F) / (m * r)]
-        except OverflowError:
-            dydt = y
-        return dydt
-
     def vitesse_looping(g, masse, acceleration, v_initial):
-        r = 6
-        temps = 0
-        theta_initial = 0.0
-        theta_dot_initial = v_initial / r
-
-        t = np.linspace(0, 5, 1000)
-
-        solution = odeint(systeme_equations, [theta_initial, theta_dot_initial], t,
-                          args=(masse, g, r, acceleration))
+        trajectoire = []
+        vitesse, temps = CACHE.appeler(solveurs.vitesse_looping, g, masse, acceleration, v_initial, trajectoire=trajectoire)
 
-        theta = solution[:, 0]
-        theta_dot = solution[:, 1]
+        df = pd.DataFrame(trajectoire, columns=["Theta", "Vitesse de la voiture"])
+        st.line_chart(decimer(df, 'Theta', 'Vitesse de la voiture'), x='Theta', y='Vitesse de la voiture',width=650)
 
-        def tri(n):
-            return n < 2 * mt.pi
-
-        filtered_theta = list(filter(tri, theta))
-        filtered_theta_dot = theta_dot[:len(filtered_theta)]
-
-        temps = t[len(filtered_theta) - 1]
-        vitesse = r * filtered_theta_dot
-
-        data = {"Theta": filtered_theta, "Vitesse de la voiture": vitesse}
-        df = pd.DataFrame(data)
-        st.line_chart(df, x='Theta', y='Vitesse de la voiture',width=650)
-
-        return vitesse[-1],temps
-
-    def systeme_equations_frottement(y, t, m, g, r, Cx, rho, Sx, frot, F):
-        try:
-            dydt = [y[1],
-                    (-m * g * np.sin(y[0]) - 0.5 * Cx * rho * Sx * (r * y[1] ** 2) - frot * (r * (y[1] ** 2)) + F) / (
-                                m * r)]
-        except OverflowError:
-            dydt = y
-        return dydt
+        return vitesse,temps
 
     def vitesse_looping_frottement(g, masse, acceleration, v_initial, mu, rho, Cx, L, h):
-        r = 6
-        temps = 0
-        Sx = L * h
-        theta_initial = 0.0
-        theta_dot_initial = v_initial / r
-
-        t = np.linspace(0, 5, 1000)
+        trajectoire = []
+        vitesse, temps = CACHE.appeler(solveurs.vitesse_looping_frottement, g, masse, acceleration, v_initial,
+                                           mu, rho, Cx, L, h, trajectoire=trajectoire)
 
-        solution = odeint(systeme_equations_frottement, [theta_initial, theta_dot_initial], t,
-                          args=(masse, g, r, Cx, rho, Sx, mu, acceleration))
+        df = pd.DataFrame(trajectoire, columns=["Theta", "Vitesse de la voiture"])
+        st.line_chart(decimer(df, 'Theta', 'Vitesse de la voiture'), x='Theta', y='Vitesse de la voiture',width=650)
 
-        theta = solution[:, 0]
-        theta_dot = solution[:, 1]
-
-        def tri(n):
-            return n < 2 * mt.pi
-
-        filtered_theta = list(filter(tri, theta))
-        filtered_theta_dot = theta_dot[:len(filtered_theta)]
-
-        vitesse = r * filtered_theta_dot
-        temps = t[len(filtered_theta)-1]
-
-        data = {"Theta": filtered_theta, "Vitesse de la voiture": vitesse}
-        df = pd.DataFrame(data)
-        st.line_chart(df, x='Theta', y='Vitesse de la voiture',width=650)
-
-        return vitesse[-1],temps
-
-    def position_x(t,v_initial):
-        v = v_initial * t
-        return v
-
-    def position_y(t):
-        v = 0.5 *  -9.81 * t**2
-        return v
+        return vitesse,temps
 
     def graph_ravin(v_initial):
         if v_initial <=0:
             st.write("Ravin Impossible.")
             st.caption("Vitesse doit être supérieur à 0.")
             return 0,0
-        temps = 0
-        x=0
-        y=0
-        x_values = []
-        y_values = []
-        while x<9:
-            x = position_x(temps, v_initial)
-            y = position_y(temps)
-            x_values.append(x)
-            y_values.append(y)
+        trajectoire = []
+        v_ravin, temps = solveurs.vitesse_ravin(v_initial, trajectoire=trajectoire)
 
-            temps += 0.0001
+        df = pd.DataFrame(trajectoire, columns=["Longueur", "Hauteur"])
+        st.scatter_chart(decimer(df, 'Longueur', 'Hauteur'), x='Longueur', y='Hauteur',width=650)
 
-        data = {"Longueur": x_values, "Hauteur": y_values}  # Inversez les rôles de x_values et y_values
-        df = pd.DataFrame(data)
-        st.scatter_chart(df, x='Longueur', y='Hauteur',width=650)
-
-        return v_initial,temps
+        return v_ravin,temps
 
     def graph_ravin_frottement(v_initial, g , masse, l, L, h, Cx, Cz):
         if v_initial <=0:
             st.write("Ravin Impossible.")
             st.caption("Vitesse doit être supérieur à 0.")
             return 0,0
-        temps = 0
-        dt = 0.0001
-        v_x = v_initial
-        v_y = 0
-        x=0
-        y=1
-        x_values = []
-        y_values = []
-        kx = (0.5 * (1.225 * l * h * Cx))
-        ky = (0.5 * (1.225 * L * l * Cz))
-
-        ay = -g
-
-        while x<9:
-
-            v_x -= (kx/masse) * (v_x**2) * dt
-            v_y += ( ay - (ky/masse) * (v_y**2)) * dt
-
-            x += v_x * dt
-            y += v_y * dt
-            # print(v_x,v_y)
-            x_values.append(x)
-            y_values.append(y)
-
-            temps += dt
-
-        data = {"Longueur": x_values, "Hauteur": y_values}  # Inversez les rôles de x_values et y_values
-        df = pd.DataFrame(data)
-        st.scatter_chart(df, x='Longueur', y='Hauteur',width=650)
-
-        return v_x,temps
-
-    def vitesse_piste(g, masse, acceleration, v_initial):
-        OM = 0
-        t = 0
-        while OM < 10:
-            OM = 0.5 * (acceleration) * t**2 + v_initial*t
-            t = t + 0.0001
-            #print(OM)
-        #print(t)
-        v = acceleration * t + v_initial
-        return v,t
-
-    def vitesse_piste_frottement(g, masse, acceleration, v_initial, l, L, h, Cx):
-        v = v_initial
-        t = 0
-        OM = 0
-        dt = 0.00001
-        Surface = L * h
-        k = 0.5 * (1.225 * Surface * Cx)
-        while OM < 10:
-            v += (acceleration - ((k * v**2) / masse)  - (0.1 * g) ) * dt
-            OM += v * dt
-            t += dt
-            # print(v, OM)
-        return v,t
-
-    def calculer(caracteristiques):
+        trajectoire = []
+        v_ravin, temps = solveurs.vitesse_ravin_frottement(v_initial, g, masse, l, L, h, Cx, Cz,
+                                                           trajectoire=trajectoire)
+
+        df = pd.DataFrame(trajectoire, columns=["Longueur", "Hauteur"])
+        st.scatter_chart(decimer(df, 'Longueur', 'Hauteur'), x='Longueur', y='Hauteur',width=650)
+
+        return v_ravin,temps
+
+    def calculer(voiture):
         g = 9.81
-        masse = int(caracteristiques[1])
-        acceleration = float(caracteristiques[2])
-        l = float(caracteristiques[3])
-        L = float(caracteristiques[4])
-        h = float(caracteristiques[5])
-        Cx = float(caracteristiques[6])
-        Cz = float(caracteristiques[7])
-        print(g,masse,acceleration,l,L,h,Cx,Cz)
+        masse = int(voiture.masse)
+        acceleration = voiture.acceleration
+        l = voiture.l
+        L = voiture.L
+        h = voiture.h
+        Cx = voiture.Cx
+        Cz = voiture.Cz
+        LOGGER.debug("Partie %s : g=%s masse=%s acceleration=%s l=%s L=%s h=%s Cx=%s Cz=%s", partie_circuit,
+                     g, masse, acceleration, l, L, h, Cx, Cz)
         st.divider()
         if partie_circuit == "Pente":
             if frottements == False :
@@ -377,315 +280,278 @@ def run():
                     st.write(v_piste, "m/s")
                     st.write(temps, "s")
 
-    def calculer_all(caracteristiques):
-        g = 9.81
-        masse = int(caracteristiques[1])
-        acceleration = float(caracteristiques[2])
-        l = float(caracteristiques[3])
-        L = float(caracteristiques[4])
-        h = float(caracteristiques[5])
-        Cx = float(caracteristiques[6])
-        Cz = float(caracteristiques[7])
-        print(g,masse,acceleration,l,L,h,Cx,Cz)
-
-        if nos_pente:
-            acceleration_pente = acceleration*1.3
+    def calculer_all(voiture, profil=False):
+        caracteristiques, options = voiture.caracteristiques(), options_tour()
+        LOGGER.info("Tour complet demandé : %s, options %s", voiture.nom, options)
+        # Chaque partie s'affiche dès qu'elle est calculée, sans attendre les segments suivants
+        segments = Tour.circuit().segments
+        parties = {segment.nom: colonne.empty() for segment, colonne in zip(segments, st.columns(len(segments)))}
+        for nom, partie in parties.items():
+            partie.caption(nom.upper() + " : calcul en cours…")
+        # Le calcul part dans le pool de processus partagé ; un tour identique déjà en cours est réutilisé.
+        # Pour un profil, il est fait ici et sans le cache sur disque, pour que tout le calcul y apparaisse
+        def suivre(nom, avancement):
+            my_bar.progress(avancement, text=f"{nom.upper()} en cours ({avancement:.0%})")
+
+        try:
+            if profil:
+                etapes = ((segment.nom, avancement, resultats) for segment, avancement, resultats
+                          in Tour.etapes(caracteristiques, options, cache=None, nom=voiture.nom,
+                                         suivi=lambda segment, avancement: suivre(segment.nom, avancement)))
+            else:
+                etapes = calculs.etapes(caracteristiques, options, voiture.nom, suivi=suivre)
+            for nom, avancement, resultats in etapes:
+                parties[nom].metric(nom.upper(), str(round(resultats["v_" + nom], 2)) + " m/s",
+                                    str(round(resultats["temps_" + nom], 2)) + " s", delta_color="off")
+                my_bar.progress(avancement, text=f"{nom.upper()} calculé ({avancement:.0%})")
+        except calculs.Surcharge:
+            my_bar.empty()
+            st.warning("Le serveur calcule déjà beaucoup de tours, réessayez dans quelques secondes.")
+            return
+        except TimeoutError:
+            my_bar.empty()
+            st.error(f"Le calcul du tour a pris plus de {calculs.ATTENTE_MAX:.0f} s et a été abandonné.")
+            return
+        except BrokenProcessPool:
+            # Le pool est recréé au prochain calcul (voir calculs.Pool)
+            my_bar.empty()
+            LOGGER.exception("Processus de calcul arrêté pendant le tour de %s", voiture.nom)
+            st.error("Le processus de calcul s'est arrêté pendant le tour, relancez le calcul.")
+            return
+        # Tout le tour est calculé une fois et gardé dans la session : changer d'onglet ne relance aucun calcul
+        st.session_state["tour"] = Tour.depuis_resultats(caracteristiques, options, resultats)
+        my_bar.empty()
+
+    def options_tour():
+        return dict(nos_pente=nos_pente, nos_looping=nos_looping, nos_piste=nos_piste,
+                    ailerons=utiliser_ailerons, frottements=frottements)
+
+    def onglet_pente(tour, segment):
+        st.title("Pente :")
+        st.write("Le calcul de la vitesse à la fin de la pente")
+        st.write(round(tour.vitesses[segment.nom], 2), "m/s")
+        st.write("Chrono :")
+        st.write(round(tour.temps[segment.nom], 2), "s")
+        st.divider()
+        st.image(medias.lire("pente"), caption='Schéma des forces dans la pente', width=650)
+        st.caption("*Rappel des équations de mouvements :*")
+        if tour.options["frottements"]:
+            st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(g \sin{\left(\alpha\right)} + a_m - \frac{\mu \cdot N - \frac{1}{2} \rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t^2''')
+            st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g \cos{\left(\alpha\right)} + \frac{R}{m}\right) t^2''')
+        else:
+            equa1, equa2 = st.columns([0.5,0.5])
+            with equa1:
+                st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(g \sin{\left(\alpha\right)} + a_m\right) t^2''')
+            with equa2:
+                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g \cos{\left(\alpha\right)} + \frac{R}{m}\right) t^2''')
+
+    def onglet_looping(tour, looping):
+        g = solveurs.G
+        r = looping.parametres["rayon"]   # Rayon du looping, lu dans la description du circuit
+        v_min_looping_A = mt.sqrt(2* g * (2*r)) #Vitesse minimal pour passer la pente du looping
+        v_min_looping_B = looping.vitesse_min #Vitesse minimal pour franchir le looping
+        st.title("Looping :")
+        st.caption("Tracé de la vitesse :")
+        st.line_chart(decimer(tour.trajectoire_looping(looping.nom), 'Theta', 'Vitesse de la voiture'), x='Theta',
+                      y='Vitesse de la voiture', width=650)
+
+        col_A, col_B = st.columns([0.5, 0.5])
+        with col_A:
+            st.write("Vitesse minimum pour passer la pente du looping :")
+            st.write(round(v_min_looping_A, 2), "m/s")
+            st.latex(r'''v_{\text{min}} = \sqrt{2g(h)}''')
+
+        with col_B:
+            st.write("Vitesse minimum pour passer le looping en entier :")
+            st.write(round(v_min_looping_B, 2), "m/s")
+            st.latex(r'''v_{\text{min}} = \sqrt{g \cdot r}''')
+
+        st.divider()
+        v_entree = tour.entree(looping.nom)
+        st.metric("Vitesse à la fin du looping :", str(round(tour.vitesses[looping.nom], 2)) + " m/s",
+                  round(v_entree - v_min_looping_B, 2))
+        if v_entree < v_min_looping_B:
+            st.write("Le looping est donc impossible")
         else:
-            acceleration_pente = acceleration
-        if nos_looping:
-            acceleration_looping = acceleration*1.3
+            st.write("Le looping est donc possible")
+        st.write("Chrono :")
+        st.write(round(tour.temps[looping.nom], 2), "s")
+
+        st.divider()
+        st.image(medias.lire("looping"), caption='Schéma des forces dans le looping', width=660)
+        st.caption("*Rappel des équations de mouvements :*")
+        st.latex(r'''\vec{OM} = r \vec{e}_r''')
+        equa1, equa2 = st.columns([0.5, 0.5])
+        with equa1:
+            st.latex(r'''\vec{e}_r = - r \dot{\theta}^2 = g \cos{\theta} - R''')
+        with equa2:
+            if tour.options["frottements"]:
+                st.latex(r'''\vec{e}_\theta = r \ddot{\theta} = mg \sin{\theta} + a_m - \frac{\mu N - \frac{1}{2} \rho v^2 s C_x}{m}''')
+            else:
+                st.latex(r'''\vec{e}_\theta = r \ddot{\theta} = g \sin{\theta} + a_m''')
+
+    def onglet_ravin(tour, ravin):
+        v_min_ravin = ravin.vitesse_min
+        st.title("Ravin :")
+        st.caption("Trajectoire de la voiture :")
+        trajectoire = tour.trajectoire_ravin(ravin.nom)
+        if trajectoire.empty:
+            st.write("Ravin Impossible.")
+            st.caption("Vitesse doit être supérieur à 0.")
         else:
-            acceleration_looping = acceleration
-        if nos_piste:
-            acceleration_piste = acceleration*1.3
+            st.scatter_chart(decimer(trajectoire, 'Longueur', 'Hauteur'), x='Longueur', y='Hauteur', width=650)
+        st.write("Vitesse minimum pour passer le ravin :")
+        st.write(round(v_min_ravin, 2), "m/s")
+        v_ravin = tour.vitesses[ravin.nom]
+        st.metric("Vitesse à la fin du ravin", str(round(v_ravin, 2)) + "m/s", round(v_ravin - v_min_ravin, 2))
+        if v_ravin < v_min_ravin:
+            st.write("Ravin est donc impossible")
         else:
-            acceleration_piste = acceleration
-        if utiliser_ailerons:
-            Cz = Cz * 1.1
-            Cx = Cx * 0.95
-            masse = masse+45
-
-        if frottements:
-            st.divider()
-            my_bar.progress(25, text=progress_text)
-
-            tab1, tab2, tab3, tab4, tab5 = st.tabs(["① PENTE", "② LOOPING", "③ RAVIN", "④ PISTE", "⑤ RECAP"])
-
-            with tab1:
-                v_pente, temps_pente = vitesse_pente_frottement(g, masse, acceleration_pente, l, L, h, Cx)
-                st.title("Pente :")
-                st.write("Le calcul de la vitesse à la fin de la pente")
-                st.write(round(v_pente, 2), "m/s")
-                st.write("Chrono :")
-                st.write(round(temps_pente, 2), "s")
-                st.divider()
-                st.image("Pente.png", caption='Schéma des forces dans la pente', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(g \sin{\left(\alpha\right)} + a_m - \frac{\mu \cdot N - \frac{1}{2} \rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t^2''')
-                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g \cos{\left(\alpha\right)} + \frac{R}{m}\right) t^2''')
+            st.write("Ravin est donc possible")
+        st.write("Chrono :")
+        st.write(round(tour.temps[ravin.nom], 2), "s")
+        st.divider()
+        st.image(medias.lire("ravin"), caption='Schéma des forces dans le ravin', width=650)
+        st.caption("*Rappel des équations de mouvements :*")
+        equa1, equa2 = st.columns([0.5, 0.5])
+        if tour.options["frottements"]:
+            with equa1:
+                st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(-\frac{1}{2} \frac{\rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t^2 + v_0 t''')
+            with equa2:
+                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{\rho \cdot v^2 \cdot s \cdot C_z}{m}\right) t^2''')
+        else:
+            with equa1:
+                st.latex(r'''\overrightarrow{OM}_x = V_0 t''')
+            with equa2:
+                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g\right) t^2''')
 
-                my_bar.progress(50, text=progress_text)
-
-            with tab2:
-                r = 6   # Rayon du looping
-                v_min_looping_A = mt.sqrt(2* g * (2*r)) #Vitesse minimal pour passer la pente du looping
-                v_min_looping_B = mt.sqrt(g * r) #Vitesse minimal pour franchir le looping
-                st.title("Looping :")
-                st.caption("Tracé de la vitesse :")
-                v_looping, temps_looping = vitesse_looping_frottement(g, masse, acceleration_looping, v_pente, 0.1, 1.225, Cx, L, h)
-
-                col_A, col_B = st.columns([0.5, 0.5])
-                with col_A:
-                    st.write("Vitesse minimum pour passer la pente du looping :")
-                    st.write(round(v_min_looping_A, 2), "m/s")
-                    st.latex(r'''v_{\text{min}} = \sqrt{2g(h)}''')
-
-                with col_B:
-                    st.write("Vitesse minimum pour passer le looping en entier :")
-                    st.write(round(v_min_looping_B, 2), "m/s")
-                    st.latex(r'''v_{\text{min}} = \sqrt{g \cdot r}''')
-
-                st.divider()
-                st.metric("Vitesse à la fin du looping :", str(round(v_looping, 2)) + " m/s",
-                          round(v_pente - v_min_looping_B, 2))
-                if v_pente < v_min_looping_B:
-                    st.write("Le looping est donc impossible")
-                else:
-                    st.write("Le looping est donc possible")
-                st.write("Chrono :")
-                st.write(round(temps_looping, 2), "s")
-
-                st.divider()
-                st.image("Looping.png", caption='Schéma des forces dans le looping', width=660)
-                st.caption("*Rappel des équations de mouvements :*")
-                st.latex(r'''\vec{OM} = r \vec{e}_r''')
-                equa1, equa2 = st.columns([0.5, 0.5])
-                with equa1:
-                    st.latex(r'''\vec{e}_r = - r \dot{\theta}^2 = g \cos{\theta} - R''')
-                with equa2:
-                    st.latex(r'''\vec{e}_\theta = r \ddot{\theta} = mg \sin{\theta} + a_m - \frac{\mu N - \frac{1}{2} \rho v^2 s C_x}{m}''')
-
-                my_bar.progress(75, text=progress_text)
-
-            with tab3:
-                v_min_ravin = 20
-                st.title("Ravin :")
-                st.caption("Trajectoire de la voiture :")
-                v_ravin, temps_ravin = graph_ravin_frottement(v_looping,g,masse,l,L,h,Cx,Cz)
-                st.write("Vitesse minimum pour passer le ravin :")
-                st.write(round(v_min_ravin, 2), "m/s")
-                st.metric("Vitesse à la fin du ravin", str(round(v_ravin, 2)) + "m/s", round(v_ravin - v_min_ravin, 2))
-                if v_ravin < v_min_ravin:
-                    st.write("Ravin est donc impossible")
-                else:
-                    st.write("Ravin est donc possible")
-                st.write("Chrono :")
-                st.write(round(temps_ravin, 2), "s")
-                st.divider()
-                st.image("Ravin.png", caption='Schéma des forces dans le ravin', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                equa1, equa2 = st.columns([0.5, 0.5])
-                with equa1:
-                    st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(-\frac{1}{2} \frac{\rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t^2 + v_0 t''')
-                with equa2:
-                    st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{\rho \cdot v^2 \cdot s \cdot C_z}{m}\right) t^2''')
-
-                my_bar.progress(100, text=progress_text)
-
-            with tab4:
-                v_piste, temps_piste = vitesse_piste_frottement(g,masse,acceleration_piste,v_ravin,l,L,h,Cx)
-                st.title("Fin de piste :")
-                st.write("Le calcul de la vitesse à la fin de la piste")
-                st.write(round(v_piste, 2), "m/s")
-
-                st.divider()
-                st.image("Piste.png", caption='Schéma des forces dans la piste', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                equa1, equa2 = st.columns([0.5, 0.5])
-                with equa1:
-                    st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(-\frac{1}{2} \frac{\rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t + v_0 t''')
-                with equa2:
-                    st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{\rho \cdot v^2 \cdot s \cdot C_z}{m}\right) t^2''')
-
-                my_bar.empty()
-
-            with tab5:
-                temps_total = temps_pente+temps_looping+temps_ravin+temps_piste
-                st.write("Chrono pour tout le circuit :")
-                st.write(round(temps_total, 3),"seconde(s)")
-                st.divider()
-                if temps_total < 8 and v_min_ravin < v_looping and v_min_looping_B < v_pente:
-                    st.subheader("RECORD BATTU !")
-                    st.image("https://forums.pixeltailgames.com/uploads/default/original/3X/d/1/d12d0941862841dad6ffe2281b25aeb8d971f3b0.gif")
-                elif v_min_ravin > v_looping or v_min_looping_B > v_pente :
-                    st.subheader("C'EST LE CRASH !")
-                    st.image("https://pa1.aminoapps.com/6825/e33c02e435883599bace42ae25b1e1bbf4cacdb5_hq.gif")
-                    st.image("https://i.gifer.com/SqwX.gif")
-                else:
-                    st.subheader("RECORD RATÉ !")
-                    st.image("https://media1.tenor.com/m/fVtFN_1f1HkAAAAC/mario-kart.gif")
-                st.divider()
-                st.header("◇ Récapitulatif des vitesses")
-
-                v1, v2 = st.columns([0.5,0.5])
-                with v1:
-                    st.subheader("Vitesse en m/s")
-                    st.write("› Vitesse pente :", round(v_pente,2), "m/s")
-                    st.write("› Vitesse looping :", round(v_looping,2), "m/s")
-                    st.write("› Vitesse ravin :", round(v_ravin,2), "m/s")
-                    st.write("› Vitesse piste :", round(v_piste,2), "m/s")
-                with v2:
-                    st.subheader("Vitesse en km/h")
-                    st.write("› Vitesse pente :", round(v_pente*3.6,2), "km/h")
-                    st.write("› Vitesse looping :", round(v_looping*3.6,2), "km/h")
-                    st.write("› Vitesse ravin :", round(v_ravin*3.6,2), "km/h")
-                    st.write("› Vitesse piste :", round(v_piste*3.6,2), "km/h")
+    def onglet_piste(tour, segment):
+        st.title("Fin de piste :")
+        st.write("Le calcul de la vitesse à la fin de la piste")
+        st.write(round(tour.vitesses[segment.nom], 2), "m/s")
 
+        st.divider()
+        st.image(medias.lire("piste"), caption='Schéma des forces dans la piste', width=650)
+        st.caption("*Rappel des équations de mouvements :*")
+        equa1, equa2 = st.columns([0.5, 0.5])
+        if tour.options["frottements"]:
+            with equa1:
+                st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(-\frac{1}{2} \frac{\rho \cdot v^2 \cdot s \cdot C_x}{m}\right) t + v_0 t''')
+            with equa2:
+                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{\rho \cdot v^2 \cdot s \cdot C_z}{m}\right) t^2''')
         else:
-            st.divider()
-            my_bar.progress(25, text=progress_text)
-
-            tab1, tab2, tab3, tab4, tab5 = st.tabs(["① PENTE", "② LOOPING", "③ RAVIN", "④ PISTE", "⑤ RECAP"])
-
-            with tab1:
-                v_pente,temps_pente = vitesse_pente(g,masse,acceleration_pente)
-                st.title("Pente :")
-                st.write("Le calcul de la vitesse à la fin de la pente")
-                st.write(round(v_pente, 2), "m/s")
-                st.write("Chrono :")
-                st.write(round(temps_pente, 2), "s")
-                st.divider()
-                st.image("Pente.png", caption='Schéma des forces dans la pente', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                equa1, equa2 = st.columns([0.5,0.5])
-                with equa1:
-                    st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} \left(g \sin{\left(\alpha\right)} + a_m\right) t^2''')
-                with equa2:
-                    st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g \cos{\left(\alpha\right)} + \frac{R}{m}\right) t^2''')
-                my_bar.progress(50, text=progress_text)
-
-            with tab2:
-                r = 6  # Rayon du looping
-                v_min_looping_A = mt.sqrt(2 * g * (2*r))  # Vitesse minimal pour passer la pente du looping
-                v_min_looping_B = mt.sqrt(g * r)  # Vitesse minimal pour franchir le looping
-                st.title("Looping :")
-                st.caption("Tracé de la vitesse :")
-                v_looping, temps_looping = vitesse_looping(g, masse, acceleration_looping, v_pente)
-
-                col_A, col_B = st.columns([0.5, 0.5])
-                with col_A:
-                    st.write("Vitesse minimum pour passer la pente du looping :")
-                    st.write(round(v_min_looping_A, 2), "m/s")
-                    st.latex(r'''v_{\text{min}} = \sqrt{2g(h)}''')
-
-                with col_B:
-                    st.write("Vitesse minimum pour passer le looping en entier :")
-                    st.write(round(v_min_looping_B, 2), "m/s")
-                    st.latex(r'''v_{\text{min}} = \sqrt{g \cdot r}''')
-
-                st.divider()
-                st.metric("Vitesse à la fin du looping :", str(round(v_looping,2)) + " m/s", round(v_pente-v_min_looping_B,2))
-                if v_pente < v_min_looping_B:
-                    st.write("Le looping est donc impossible")
-                else:
-                    st.write("Le looping est donc possible")
-                st.write("Chrono :")
-                st.write(round(temps_looping, 2), "s")
-
-                st.divider()
-                st.image("Looping.png", caption='Schéma des forces dans le looping', width=660)
-                st.caption("*Rappel des équations de mouvements :*")
-                st.latex(r'''\vec{OM} = r \vec{e}_r''')
-                equa1, equa2 = st.columns([0.5, 0.5])
-                with equa1:
-                    st.latex(r'''\vec{e}_r = - r \dot{\theta}^2 = g \cos{\theta} - R''')
-                with equa2:
-                    st.latex(r'''\vec{e}_\theta = r \ddot{\theta} = g \sin{\theta} + a_m''')
-
-                my_bar.progress(75, text=progress_text)
-
-            with tab3:
-                v_min_ravin = 20
-                st.title("Ravin :")
-                st.caption("Trajectoire de la voiture :")
-                v_ravin, temps_ravin = graph_ravin(v_looping)
-                st.write("Vitesse minimum pour passer le ravin :")
-                st.write(round(v_min_ravin, 2), "m/s")
-                st.metric("Vitesse à la fin du ravin", str(round(v_ravin,2)) + "m/s", round(v_ravin-v_min_ravin, 2))
-                if v_ravin<v_min_ravin:
-                    st.write("Ravin est donc impossible")
-                else:
-                    st.write("Ravin est donc possible")
-                st.write("Chrono :")
-                st.write(round(temps_ravin, 2), "s")
-                st.divider()
-                st.image("Ravin.png", caption='Schéma des forces dans le ravin', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                equa1, equa2 = st.columns([0.5,0.5])
-                with equa1:
-                    st.latex(r'''\overrightarrow{OM}_x = V_0 t''')
-                with equa2:
-                    st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g\right) t^2''')
-
-                my_bar.progress(100, text=progress_text)
-
-            with tab4:
-                v_piste, temps_piste = vitesse_piste(g,masse,acceleration_piste,v_ravin)
-                st.title("Fin de piste :")
-                st.write("Le calcul de la vitesse à la fin de la piste")
-                st.write(round(v_piste, 2), "m/s")
-
-                st.divider()
-                st.image("Piste.png", caption='Schéma des forces dans la piste', width=650)
-                st.caption("*Rappel des équations de mouvements :*")
-                equa1, equa2 = st.columns([0.5, 0.5])
-                with equa1:
-                    st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} a_m t^2 + V_0 t''')
-                with equa2:
-                    st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{R}{m}\right) t^2''')
-                my_bar.empty()
-
-            with tab5:
-                temps_total = temps_pente+temps_looping+temps_ravin+temps_piste
-                st.write("Chrono pour tout le circuit :")
-                st.write(round(temps_total, 3),"seconde(s)")
-                st.divider()
-                if temps_total < 8 and v_min_ravin < v_looping and v_min_looping_B < v_pente:
-                    st.subheader("RECORD BATTU !")
-                    st.image("https://forums.pixeltailgames.com/uploads/default/original/3X/d/1/d12d0941862841dad6ffe2281b25aeb8d971f3b0.gif")
-                elif v_min_ravin > v_looping or v_min_looping_B > v_pente :
-                    st.subheader("C'EST LE CRASH !")
-                    st.image("https://pa1.aminoapps.com/6825/e33c02e435883599bace42ae25b1e1bbf4cacdb5_hq.gif")
-                    st.image("https://i.gifer.com/SqwX.gif")
-                else:
-                    st.subheader("RECORD RATÉ !")
-                    st.image("https://media1.tenor.com/m/fVtFN_1f1HkAAAAC/mario-kart.gif")
-                st.divider()
-                st.header("◇ Récapitulatif des vitesses")
-
-                v1, v2 = st.columns([0.5,0.5])
-                with v1:
-                    st.subheader("Vitesse en m/s")
-                    st.write("› Vitesse pente :", round(v_pente,2), "m/s")
-                    st.write("› Vitesse looping :", round(v_looping,2), "m/s")
-                    st.write("› Vitesse ravin :", round(v_ravin,2), "m/s")
-                    st.write("› Vitesse piste :", round(v_piste,2), "m/s")
-                with v2:
-                    st.subheader("Vitesse en km/h")
-                    st.write("› Vitesse pente :", round(v_pente*3.6,2), "km/h")
-                    st.write("› Vitesse looping :", round(v_looping*3.6,2), "km/h")
-                    st.write("› Vitesse ravin :", round(v_ravin*3.6,2), "km/h")
-                    st.write("› Vitesse piste :", round(v_piste*3.6,2), "km/h")
+            with equa1:
+                st.latex(r'''\overrightarrow{OM}_x = \frac{1}{2} a_m t^2 + V_0 t''')
+            with equa2:
+                st.latex(r'''\overrightarrow{OM}_y = \frac{1}{2} \left(-g + \frac{R}{m}\right) t^2''')
+
+    def onglet_recap(tour, segment=None):
+        st.write("Chrono pour tout le circuit :")
+        st.write(round(tour.temps_total, 3),"seconde(s)")
+        st.divider()
+        if tour.resultat == "RECORD BATTU":
+            st.subheader("RECORD BATTU !")
+            st.image(medias.image("record_battu"))
+        elif tour.resultat == "CRASH":
+            st.subheader("C'EST LE CRASH !")
+            st.image(medias.image("crash"))
+            st.image(medias.image("crash_2"))
+        else:
+            st.subheader("RECORD RATÉ !")
+            st.image(medias.image("record_rate"))
+        st.divider()
+        st.header("◇ Récapitulatif des vitesses")
+
+        v1, v2 = st.columns([0.5,0.5])
+        with v1:
+            st.subheader("Vitesse en m/s")
+            for nom, v in tour.vitesses.items():
+                st.write(f"› Vitesse {nom} :", round(v,2), "m/s")
+        with v2:
+            st.subheader("Vitesse en km/h")
+            for nom, v in tour.vitesses.items():
+                st.write(f"› Vitesse {nom} :", round(v*3.6,2), "km/h")
+
+    def afficher_tour(tour):
+        st.divider()
+        # Changer d'onglet relance le script : seul le contenu de l'onglet ouvert (schémas,
+        # équations, graphiques) est construit et envoyé au navigateur
+        # Un onglet par segment du circuit, dans l'ordre, puis le récapitulatif
+        segments = [*Tour.circuit().segments, None]
+        titres = [chr(ord("①") + i) + " " + (segment.nom.upper() if segment else "RECAP")
+                  for i, segment in enumerate(segments)]
+        onglets = st.tabs(titres, default=titres[-1], key="onglet_tour", on_change="rerun")
+        for onglet, segment in zip(onglets, segments):
+            if onglet.open:
+                with onglet:
+                    ONGLETS[segment.type if segment else None](tour, segment)
+
+    ONGLETS = {"pente": onglet_pente, "looping": onglet_looping, "ravin": onglet_ravin,
+               "ligne_droite": onglet_piste, None: onglet_recap}
+
+    def calculer_limites(voiture):
+        from inverse import acceleration_min, cx_max, vitesse_min_looping
+
+        caracteristiques = voiture.caracteristiques()
+        options = options_tour()
+        st.divider()
+        st.subheader("▪ Limites de la voiture avec ces options :")
+        col_v, col_a, col_cx = st.columns(3)
+        with col_v:
+            v_min = vitesse_min_looping(**caracteristiques, **options)
+            st.metric("Vitesse minimale en bas de la pente", "—" if v_min is None else str(round(v_min, 2)) + " m/s")
+            st.caption("Pour franchir le looping et le ravin, et battre le record. Le chrono de la pente est "
+                       "celui d'une voiture partie à l'arrêt qui accélère de façon constante jusqu'à cette vitesse")
+        with col_a:
+            a_min = acceleration_min(**caracteristiques, **options)
+            st.metric("Accélération minimale", "—" if a_min is None else str(round(a_min, 3)) + " m/s²",
+                      None if a_min is None else round(voiture.acceleration - a_min, 3))
+            st.caption("Pour battre le record")
+        with col_cx:
+            cx = cx_max(**caracteristiques, **options)
+            st.metric("Cx maximal", "—" if cx is None else "∞" if cx == mt.inf else str(round(cx, 3)),
+                      None if cx is None or cx == mt.inf else round(cx - voiture.Cx, 3))
+            st.caption("Pour battre le record")
 
     my_bar = st.progress(0, text=progress_text)
     my_bar.empty()
 
     # Bouton pour effectuer le calcul
     if st.button("CALCULER partie circuit"):
-        calculer(caracteristiques)
-
-    if st.button("CALCULER CIRCUIT tout le circuit"):
-        calculer_all(caracteristiques)
+        calculer(voiture)
+
+    calcul_demande = st.button("CALCULER CIRCUIT tout le circuit")
+    # Profilage à la demande (PROFILAGE=1 ou ?profilage=1) : calcul et affichage du tour, graphiques compris
+    profil = calcul_demande and profilage.demande(st.query_params)
+    with profilage.profiler(f"tour-{voiture.nom}") if profil else contextlib.nullcontext() as capture:
+        if calcul_demande:
+            calculer_all(voiture, profil)
+        # Le dernier tour calculé reste affiché tant que la voiture et les options ne changent pas
+        tour = st.session_state.get("tour")
+        if tour is not None and tour.correspond(voiture.caracteristiques(), options_tour()):
+            afficher_tour(tour)
+    if profil:
+        st.info(f"Profil enregistré ({capture.duree:.2f} s) : `{capture.profil}` et `{capture.piles}`")
+
+    stats = CACHE.statistiques()
+    st.sidebar.caption(f"Cache des calculs : {stats['hits']} hits / {stats['misses']} misses "
+                       f"({stats['taux']:.0%}), {stats['entrees']} résultats en cache")
+    if calculs.PROCESSUS > 0:
+        pool = calculs.POOL.statistiques()
+        st.sidebar.caption(f"Pool de calcul : {pool['processus']} processus, {pool['en_cours']} tours en cours, "
+                           f"{pool['regroupes']} demandes regroupées, {pool['refuses']} refusées")
+    if metriques.ADMIN:
+        with st.sidebar:
+            panneau_metriques()
+
+    if st.button("CALCULER les limites de la voiture"):
+        calculer_limites(voiture)
+
+    # Classement de toutes les voitures avec toutes les combinaisons d'accessoires
+    if st.button("CLASSER toute la flotte"):
+        from flotte import simuler_flotte, classement
+
+        st.dataframe(classement(simuler_flotte(voitures.tableau())), hide_index=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+# Simulation du circuit en ligne de commande, sans serveur Streamlit
+#
+# Exemple :
+#   python batch.py --sortie resultats.csv --workers 8 --chunksize 64
+#   python batch.py --scenarios scenarios.csv --sortie resultats.parquet
+import argparse
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+import catalogue
+import circuits
+from cache_resultats import CHEMIN_CACHE, CacheResultats
+from flotte import OPTIONS, grille_configurations
+
+
+def colonnes_resultat(circuit):
+    """Colonnes de résultats : vitesse et chrono de chaque segment du circuit, puis chrono total et résultat."""
+    return [*(f"{prefixe}_{segment.nom}" for segment in circuit.segments for prefixe in ["v", "temps"]),
+            "temps_total", "resultat"]
+
+
+def charger_scenarios(fichier_voitures, fichier_scenarios=None):
+    """Liste des scénarios (numéro, nom, caractéristiques, options) à simuler.
+
+    Sans fichier de scénarios, chaque voiture est simulée avec toutes les
+    combinaisons d'options ; sinon le fichier donne une ligne par scénario avec
+    la colonne Nom et les options voulues (False si absentes).
+    """
+    voitures = catalogue.charger(fichier_voitures)
+    if fichier_scenarios is None:
+        configurations = grille_configurations()
+        scenarios = pd.DataFrame({"Nom": voitures.noms}).merge(configurations, how="cross")
+    else:
+        scenarios = pd.read_csv(fichier_scenarios)
+        for option in OPTIONS:
+            if option not in scenarios:
+                scenarios[option] = False
+
+    inconnues = {nom for nom in scenarios["Nom"] if nom not in voitures}
+    if inconnues:
+        raise ValueError("Voitures inconnues : " + ", ".join(sorted(inconnues)))
+
+    return [
+        (numero, ligne.Nom, voitures[ligne.Nom].caracteristiques(),
+         {option: bool(getattr(ligne, option)) for option in OPTIONS})
+        for numero, ligne in enumerate(scenarios.itertuples(index=False))
+    ]
+
+
+def simuler_scenarios(scenarios, chemin_cache=None):
+    """Simule un paquet de scénarios ; exécuté dans les processus de travail."""
+    cache = CacheResultats(chemin_cache) if chemin_cache else None
+    circuit = circuits.charger()
+    lignes = []
+    for numero, nom, caracteristiques, options in scenarios:
+        resultat = circuit.simuler(**caracteristiques, **options, cache=cache)
+        lignes.append({"scenario": numero, "Nom": nom, **options, **resultat})
+    return lignes
+
+
+class EcritureCSV:
+    def __init__(self, chemin):
+        self.fichier = open(chemin, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.fichier, fieldnames=["scenario", "Nom", *OPTIONS,
+                                                              *colonnes_resultat(circuits.charger())])
+        self.writer.writeheader()
+
+    def ecrire(self, lignes):
+        self.writer.writerows(lignes)
+        self.fichier.flush()
+
+    def fermer(self):
+        self.fichier.close()
+
+
+class EcritureParquet:
+    def __init__(self, chemin):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("L'écriture en Parquet nécessite pyarrow (pip install pyarrow).")
+        self.pa = pa
+        self.writer = None
+        self.ouvrir = lambda schema: pq.ParquetWriter(chemin, schema)
+
+    def ecrire(self, lignes):
+        table = self.pa.Table.from_pylist(lignes)
+        if self.writer is None:
+            self.writer = self.ouvrir(table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def fermer(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def executer(scenarios, sortie, workers=None, chunksize=32, chemin_cache=None):
+    """Répartit les scénarios sur un pool de processus et écrit les résultats au fil de l'eau.
+
+    Au plus deux paquets par processus sont en attente à la fois, pour que
+    la mémoire reste bornée même avec des milliers de scénarios.
+    """
+    if chunksize <= 0:
+        raise ValueError(f"chunksize doit être strictement positif (reçu {chunksize})")
+    workers = workers or os.cpu_count() or 1
+    ecriture = EcritureParquet(sortie) if sortie.endswith(".parquet") else EcritureCSV(sortie)
+    paquets = deque(scenarios[i:i + chunksize] for i in range(0, len(scenarios), chunksize))
+    termines = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            en_cours = set()
+            while paquets or en_cours:
+                while paquets and len(en_cours) < 2 * workers:
+                    en_cours.add(executor.submit(simuler_scenarios, paquets.popleft(), chemin_cache))
+                finis, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in finis:
+                    lignes = future.result()
+                    ecriture.ecrire(lignes)
+                    termines += len(lignes)
+    finally:
+        ecriture.fermer()
+    return termines
+
+
+def entier_positif(texte):
+    """Type argparse : entier strictement positif."""
+    try:
+        valeur = int(texte)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"entier attendu : {texte!r}") from None
+    if valeur <= 0:
+        raise argparse.ArgumentTypeError(f"doit être strictement positif : {valeur}")
+    return valeur
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Simule le circuit pour de nombreux scénarios voiture/options.")
+    parser.add_argument("--voitures", default=catalogue.FICHIER_VOITURES,
+                        help="fichier CSV des caractéristiques des voitures")
+    parser.add_argument("--scenarios", help="fichier CSV des scénarios (Nom + options) ; "
+                                            "par défaut toutes les combinaisons d'options")
+    parser.add_argument("--sortie", default="resultats.csv", help="fichier de résultats (.csv ou .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus (tous les cœurs par défaut)")
+    parser.add_argument("--chunksize", type=entier_positif, default=32, help="nombre de scénarios envoyés à la fois à un processus")
+    parser.add_argument("--cache", nargs="?", const=CHEMIN_CACHE, default=None,
+                        help="réutilise les résultats du cache sur disque (chemin optionnel)")
+    args = parser.parse_args(arguments)
+
+    scenarios = charger_scenarios(args.voitures, args.scenarios)
+    termines = executer(scenarios, args.sortie, args.workers, args.chunksize, args.cache)
+    print(f"{termines} scénarios simulés -> {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
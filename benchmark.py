@@ -0,0 +1,275 @@
+# Mesure de la vitesse et de la précision des solveurs, sans serveur Streamlit
+#
+# Les temps sont comparés en unités d'une boucle d'étalonnage mesurée dans le
+# même processus : une référence enregistrée sur une autre machine reste valable.
+#
+# Exemple :
+#   python benchmark.py                  # compare à la référence enregistrée
+#   python benchmark.py --enregistrer    # enregistre une nouvelle référence
+import argparse
+import json
+import math as mt
+import os
+import sys
+import time
+
+import pandas as pd
+from scipy.integrate import solve_ivp
+
+import solveurs
+from flotte import caracteristiques_voitures, simuler_flotte
+from solveurs import G, MU, RHO, SIN_PENTE, LONGUEUR_PENTE, LONGUEUR_PISTE, LONGUEUR_RAVIN, RAYON_LOOPING
+
+CHEMIN_REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_reference.json")
+PRECISION_MAX = 1e-6    # Erreur relative acceptée quoi qu'il arrive
+FACTEUR_PRECISION = 10  # Erreur acceptée par rapport à la référence enregistrée
+MARGE_TEMPS = 0.5       # Ralentissement accepté par rapport à la référence enregistrée (50 %)
+DUREE_MESURE = 0.2      # Durée minimale d'une mesure (en s)
+TOLERANCE_EXACTE = 1e-12
+
+
+# Solutions de référence, calculées indépendamment des solveurs avec un intégrateur d'ordre 8 très précis
+def _integrer_exact(derivees, y_initial, evenement):
+    evenement.terminal = True
+    evenement.direction = 1
+    solution = solve_ivp(derivees, (0, 1e3), y_initial, method="DOP853", events=evenement,
+                         rtol=TOLERANCE_EXACTE, atol=TOLERANCE_EXACTE)
+    if not solution.t_events[0].size:
+        return None
+    return solution.y_events[0][0], solution.t_events[0][0]
+
+
+def segment_exact(a0, k_sur_m, v_initial, distance):
+    resultat = _integrer_exact(lambda t, y: [a0 - k_sur_m * y[0] ** 2, y[0]], [v_initial, 0.0],
+                               lambda t, y: y[1] - distance)
+    if resultat is None:
+        return 0.0, mt.inf
+    (v, _), t = resultat
+    return v, t
+
+
+def looping_exact(masse, acceleration, v_initial, c):
+    r = RAYON_LOOPING
+
+    def derivees(t, y):
+        return [y[1], (-masse * G * mt.sin(y[0]) - c * r * y[1] ** 2 + acceleration) / (masse * r)]
+
+    resultat = _integrer_exact(derivees, [0.0, v_initial / r], lambda t, y: y[0] - 2 * mt.pi)
+    if resultat is None:
+        return 0.0, None
+    (_, theta_dot), t = resultat
+    return r * theta_dot, t
+
+
+def ravin_exact(v_initial, kx):
+    if v_initial <= 0:
+        return 0.0, 0.0
+    (v, _), t = _integrer_exact(lambda t, y: [-kx * y[0] ** 2, y[0]], [v_initial, 0.0],
+                                lambda t, y: y[1] - LONGUEUR_RAVIN)
+    return v, t
+
+
+def circuit_exact(masse, acceleration, l, L, h, Cx, Cz, frottements):
+    masse = int(masse)
+    k = 0.5 * RHO * L * h * Cx
+    if frottements:
+        v_pente, t_pente = segment_exact(G * SIN_PENTE + acceleration - 0.1 * G * SIN_PENTE, k / masse, 0.0,
+                                         LONGUEUR_PENTE)
+        v_looping, t_looping = looping_exact(masse, acceleration, v_pente, 0.5 * Cx * RHO * L * h + MU)
+        v_ravin, t_ravin = ravin_exact(v_looping, 0.5 * RHO * l * h * Cx / masse)
+        v_piste, t_piste = segment_exact(acceleration - 0.1 * G, k / masse, v_ravin, LONGUEUR_PISTE)
+    else:
+        v_pente, t_pente = segment_exact(G * SIN_PENTE + acceleration, 0.0, 0.0, LONGUEUR_PENTE)
+        v_looping, t_looping = looping_exact(masse, acceleration, v_pente, 1.5)
+        v_ravin, t_ravin = ravin_exact(v_looping, 0.0)
+        v_piste, t_piste = segment_exact(acceleration, 0.0, v_ravin, LONGUEUR_PISTE)
+    return v_piste, t_pente + t_looping + t_ravin + t_piste
+
+
+def erreur_relative(calcul, exact):
+    """Plus grande erreur relative sur (vitesse, temps) ; les temps None (voiture calée) ne sont pas comparés."""
+    erreur = 0.0
+    for a, b in zip(calcul, exact):
+        if b is None or a == b:
+            continue
+        erreur = max(erreur, abs(a - b) / max(abs(b), 1e-12))
+    return erreur
+
+
+def mesurer(fonction):
+    """Durée d'un appel (en s) : meilleur de 3 séries d'au moins DUREE_MESURE."""
+    nombre = 1
+    while True:
+        debut = time.perf_counter()
+        for _ in range(nombre):
+            fonction()
+        duree = time.perf_counter() - debut
+        if duree >= DUREE_MESURE:
+            break
+        nombre *= 2 if duree == 0 else max(2, min(10, int(DUREE_MESURE / duree) + 1))
+    meilleur = duree
+    for _ in range(2):
+        debut = time.perf_counter()
+        for _ in range(nombre):
+            fonction()
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur / nombre
+
+
+def _boucle_etalonnage():
+    # Arithmétique flottante en Python pur, comme l'intégrateur scalaire des solveurs
+    x = 0.0
+    for i in range(10_000):
+        x = x * 0.999 + mt.sqrt(i + 1.0)
+    return x
+
+
+def etalonner():
+    """Durée de la boucle d'étalonnage sur cette machine (en s), unité des temps comparés à la référence."""
+    return mesurer(_boucle_etalonnage)
+
+
+def cas_voiture(voiture):
+    """Liste des (nom du cas, fonction mesurée, résultat exact) pour une voiture.
+
+    Les segments sont appelés comme dans Hello.py (avec la trajectoire pour
+    les graphiques du looping et du ravin), avec en entrée la vitesse exacte
+    en sortie du segment précédent.
+    """
+    masse, acceleration, l, L, h, Cx, Cz = (voiture[p] for p in ("masse", "acceleration", "l", "L", "h", "Cx", "Cz"))
+    masse = int(masse)
+    k = 0.5 * RHO * L * h * Cx
+    kx = 0.5 * RHO * l * h * Cx / masse
+    v_pente = segment_exact(G * SIN_PENTE + acceleration, 0.0, 0.0, LONGUEUR_PENTE)
+    v_pente_f = segment_exact(G * SIN_PENTE + acceleration - 0.1 * G * SIN_PENTE, k / masse, 0.0, LONGUEUR_PENTE)
+    v_looping = looping_exact(masse, acceleration, v_pente[0], 1.5)
+    v_looping_f = looping_exact(masse, acceleration, v_pente_f[0], 0.5 * Cx * RHO * L * h + MU)
+    v_ravin = ravin_exact(v_looping[0], 0.0)
+    v_ravin_f = ravin_exact(v_looping_f[0], kx)
+    return [
+        ("vitesse_pente", lambda: solveurs.vitesse_pente(G, masse, acceleration), v_pente),
+        ("vitesse_pente_frottement", lambda: solveurs.vitesse_pente_frottement(G, masse, acceleration, l, L, h, Cx),
+         v_pente_f),
+        ("vitesse_looping", lambda: solveurs.vitesse_looping(G, masse, acceleration, v_pente[0], []), v_looping),
+        ("vitesse_looping_frottement",
+         lambda: solveurs.vitesse_looping_frottement(G, masse, acceleration, v_pente_f[0], MU, RHO, Cx, L, h, []),
+         v_looping_f),
+        ("graph_ravin", lambda: solveurs.vitesse_ravin(v_looping[0], []), v_ravin),
+        ("graph_ravin_frottement",
+         lambda: solveurs.vitesse_ravin_frottement(v_looping_f[0], G, masse, l, L, h, Cx, Cz, []), v_ravin_f),
+        ("vitesse_piste", lambda: solveurs.vitesse_piste(G, masse, acceleration, v_ravin[0]),
+         segment_exact(acceleration, 0.0, v_ravin[0], LONGUEUR_PISTE)),
+        ("vitesse_piste_frottement",
+         lambda: solveurs.vitesse_piste_frottement(G, masse, acceleration, v_ravin_f[0], l, L, h, Cx),
+         segment_exact(acceleration - 0.1 * G, k / masse, v_ravin_f[0], LONGUEUR_PISTE)),
+        ("calculer_all", lambda: _fin_circuit(solveurs.simuler_circuit(**voiture)),
+         circuit_exact(**voiture, frottements=False)),
+        ("calculer_all_frottement", lambda: _fin_circuit(solveurs.simuler_circuit(**voiture, frottements=True)),
+         circuit_exact(**voiture, frottements=True)),
+    ]
+
+
+def _fin_circuit(resultat):
+    return resultat["v_piste"], resultat["temps_total"]
+
+
+def executer(voitures):
+    """Mesure chaque cas pour chaque voiture.
+
+    Renvoie {"etalonnage": durée de la boucle d'étalonnage, "mesures": {cas:
+    {voiture: {"temps", "erreur"}}}} ; l'étalonnage est le meilleur de deux
+    mesures, avant et après les cas, pour suivre la fréquence du processeur.
+    """
+    etalonnage = etalonner()
+    mesures = {}
+    tableaux = caracteristiques_voitures(voitures)
+    for i, nom in enumerate(voitures["Nom"]):
+        voiture = {p: float(valeurs[i]) for p, valeurs in tableaux.items()}
+        for cas, fonction, exact in cas_voiture(voiture):
+            mesures.setdefault(cas, {})[nom] = {"temps": mesurer(fonction),
+                                                "erreur": erreur_relative(fonction(), exact)}
+    # Toute la flotte avec toutes les combinaisons d'options, en un seul lot vectorisé
+    mesures["simuler_flotte"] = {"flotte": {"temps": mesurer(lambda: simuler_flotte(voitures)), "erreur": 0.0}}
+    return {"etalonnage": min(etalonnage, etalonner()), "mesures": mesures}
+
+
+def _echelle(resultats, reference):
+    # Facteur qui ramène les temps de la référence à la vitesse de cette machine
+    if not reference.get("etalonnage"):
+        return 1.0
+    return resultats["etalonnage"] / reference["etalonnage"]
+
+
+def comparer(resultats, reference, marge_temps=MARGE_TEMPS):
+    """Liste des régressions de vitesse ou de précision par rapport à `reference`.
+
+    Les temps de la référence sont d'abord ramenés à cette machine par le
+    rapport des deux étalonnages.
+    """
+    regressions = []
+    echelle = _echelle(resultats, reference)
+    for cas, par_voiture in resultats["mesures"].items():
+        for nom, mesure in par_voiture.items():
+            if mesure["erreur"] > PRECISION_MAX:
+                regressions.append(f"{cas} / {nom} : erreur {mesure['erreur']:.2e} > {PRECISION_MAX:.0e}")
+            ancienne = reference.get("mesures", {}).get(cas, {}).get(nom)
+            if ancienne is None:
+                continue
+            if mesure["erreur"] > FACTEUR_PRECISION * ancienne["erreur"] + TOLERANCE_EXACTE:
+                regressions.append(f"{cas} / {nom} : erreur {mesure['erreur']:.2e} "
+                                   f"(référence {ancienne['erreur']:.2e})")
+            if mesure["temps"] > (1 + marge_temps) * echelle * ancienne["temps"]:
+                regressions.append(f"{cas} / {nom} : {1e6 * mesure['temps']:.1f} µs "
+                                   f"(référence ajustée {1e6 * echelle * ancienne['temps']:.1f} µs)")
+    return regressions
+
+
+def tableau(resultats, reference):
+    lignes = []
+    echelle = _echelle(resultats, reference)
+    for cas, par_voiture in resultats["mesures"].items():
+        for nom, mesure in par_voiture.items():
+            ancienne = reference.get("mesures", {}).get(cas, {}).get(nom, {})
+            lignes.append({"cas": cas, "voiture": nom, "temps (µs)": 1e6 * mesure["temps"],
+                           "référence ajustée (µs)": 1e6 * echelle * ancienne["temps"] if ancienne else float("nan"),
+                           "erreur": mesure["erreur"]})
+    return pd.DataFrame(lignes)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Mesure la vitesse et la précision des solveurs du circuit.")
+    parser.add_argument("--voitures", default="caracteristiques_voitures.csv",
+                        help="fichier CSV des caractéristiques des voitures")
+    parser.add_argument("--reference", default=CHEMIN_REFERENCE, help="fichier JSON de la référence enregistrée")
+    parser.add_argument("--enregistrer", action="store_true", help="enregistre les mesures comme nouvelle référence")
+    parser.add_argument("--marge", type=float, default=MARGE_TEMPS,
+                        help="ralentissement accepté par rapport à la référence (0.5 = 50 %%)")
+    args = parser.parse_args(arguments)
+
+    resultats = executer(pd.read_csv(args.voitures))
+    reference = {}
+    if os.path.exists(args.reference):
+        with open(args.reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(tableau(resultats, reference).to_string(index=False, float_format="{:.3g}".format))
+    if reference.get("etalonnage"):
+        print(f"\nÉtalonnage : {1e3 * resultats['etalonnage']:.2f} ms "
+              f"(référence {1e3 * reference['etalonnage']:.2f} ms, temps de référence x{_echelle(resultats, reference):.2f})")
+
+    if args.enregistrer:
+        with open(args.reference, "w", encoding="utf-8") as fichier:
+            json.dump(resultats, fichier, indent=2, ensure_ascii=False)
+        print(f"Référence enregistrée dans {args.reference}")
+        return 0
+
+    regressions = comparer(resultats, reference, args.marge)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) :", *regressions, sep="\n  ")
+        return 1
+    print("\nAucune régression.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
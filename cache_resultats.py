@@ -0,0 +1,212 @@
+# Cache sur disque des résultats des solveurs, partagé entre les sessions et les processus
+import atexit
+import collections
+import functools
+import hashlib
+import logging
+import numbers
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import metriques
+
+LOGGER = logging.getLogger(__name__)
+
+# À incrémenter quand un solveur change de résultat, pour ignorer les anciennes entrées
+VERSION = 2
+CHEMIN_CACHE = os.environ.get("CACHE_SIMULATION", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                ".cache", "segments.sqlite"))
+TAILLE_MAX = int(os.environ.get("CACHE_SIMULATION_TAILLE_MAX", 64 * 1024 * 1024))  # En octets
+INTERVALLE_SYNCHRONISATION = 5.0  # Écriture des compteurs et des dates d'accès en attente (en s)
+RESOLUTION_ACCES = 60.0  # Une date d'accès plus récente que ça n'est pas remise à jour (en s)
+
+
+def _normaliser(valeur):
+    # Les nombres venant de pandas/numpy doivent donner la même clé que les float Python
+    if isinstance(valeur, (bool, str)) or valeur is None:
+        return valeur
+    if isinstance(valeur, numbers.Real):
+        return float(valeur)
+    if isinstance(valeur, (tuple, list)):
+        return tuple(_normaliser(v) for v in valeur)
+    return valeur
+
+
+def cle(fonction, args, kwargs):
+    """Clé du cache : solveur, arguments (voiture, options, vitesse initiale, réglages)."""
+    texte = repr((VERSION, fonction.__module__, fonction.__qualname__, _normaliser(args),
+                  sorted((k, _normaliser(v)) for k, v in kwargs.items())))
+    return hashlib.sha256(texte.encode()).hexdigest()
+
+
+class CacheResultats:
+    """Cache LRU borné en taille, stocké dans une base SQLite.
+
+    Chaque thread et chaque processus ouvre sa propre connexion ; SQLite en
+    mode WAL se charge des accès concurrents. Une lecture ne fait qu'un
+    SELECT : les compteurs de hits/misses et les dates d'accès sont gardés
+    en mémoire et écrits dans la base par lots, au plus toutes les
+    `intervalle` secondes, pour être communs à tous les processus.
+    """
+
+    def __init__(self, chemin=CHEMIN_CACHE, taille_max=TAILLE_MAX, intervalle=INTERVALLE_SYNCHRONISATION):
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.intervalle = intervalle
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._compteurs = collections.Counter()  # Hits/misses pas encore écrits dans la base
+        self._acces = {}                         # Clé : date d'accès pas encore écrite dans la base
+        self._synchronisation = time.monotonic()
+
+    def _connexion(self):
+        connexion = getattr(self._local, "connexion", None)
+        if connexion is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.chemin) or ".", exist_ok=True)
+            connexion = sqlite3.connect(self.chemin, timeout=30, isolation_level=None)
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            connexion.execute("CREATE TABLE IF NOT EXISTS resultats (cle TEXT PRIMARY KEY, valeur BLOB, "
+                              "taille INTEGER, dernier_acces REAL)")
+            connexion.execute("CREATE INDEX IF NOT EXISTS resultats_acces ON resultats (dernier_acces)")
+            connexion.execute("CREATE TABLE IF NOT EXISTS statistiques (nom TEXT PRIMARY KEY, valeur INTEGER)")
+            connexion.execute("INSERT OR IGNORE INTO statistiques VALUES ('hits', 0), ('misses', 0), ('taille', 0)")
+            self._local.connexion = connexion
+            self._local.pid = os.getpid()
+        return connexion
+
+    def lire(self, cle):
+        """Renvoie (trouvé, valeur) ; les compteurs et la date d'accès sont mis à jour plus tard, par lots."""
+        ligne = self._connexion().execute("SELECT valeur, dernier_acces FROM resultats WHERE cle = ?",
+                                          (cle,)).fetchone()
+        maintenant = time.time()
+        with self._verrou:
+            self._compteurs["misses" if ligne is None else "hits"] += 1
+            # La date d'accès ne sert qu'à l'éviction : une précision à la minute près suffit
+            if ligne is not None and maintenant - ligne[1] > RESOLUTION_ACCES:
+                self._acces[cle] = maintenant
+            synchroniser = time.monotonic() - self._synchronisation > self.intervalle
+        if synchroniser:
+            self.synchroniser()
+        if ligne is None:
+            return False, None
+        return True, pickle.loads(ligne[0])
+
+    def synchroniser(self):
+        """Écrit dans la base, en une transaction, les compteurs et les dates d'accès en attente."""
+        with self._verrou:
+            compteurs, self._compteurs = self._compteurs, collections.Counter()
+            acces, self._acces = self._acces, {}
+            self._synchronisation = time.monotonic()
+        if not compteurs and not acces:
+            return
+        try:
+            connexion = self._connexion()
+            with connexion:
+                connexion.execute("BEGIN IMMEDIATE")
+                connexion.executemany("UPDATE statistiques SET valeur = valeur + ? WHERE nom = ?",
+                                      [(n, nom) for nom, n in compteurs.items()])
+                connexion.executemany("UPDATE resultats SET dernier_acces = ? WHERE cle = ?",
+                                      [(date, cle) for cle, date in acces.items()])
+        except sqlite3.Error as erreur:
+            LOGGER.warning("Impossible d'écrire les statistiques du cache (%s)", erreur)
+            with self._verrou:
+                self._compteurs.update(compteurs)
+                self._acces = {**acces, **self._acces}
+
+    def ecrire(self, cle, valeur):
+        donnees = pickle.dumps(valeur, protocol=pickle.HIGHEST_PROTOCOL)
+        connexion = self._connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            ancienne = connexion.execute("SELECT taille FROM resultats WHERE cle = ?", (cle,)).fetchone()
+            connexion.execute("INSERT OR REPLACE INTO resultats VALUES (?, ?, ?, ?)",
+                              (cle, donnees, len(donnees), time.time()))
+            taille = self._ajouter_taille(connexion, len(donnees) - (ancienne[0] if ancienne else 0))
+            if taille > self.taille_max:
+                self._evincer(connexion, taille - self.taille_max)
+
+    def _ajouter_taille(self, connexion, octets):
+        # La taille totale est tenue à jour pour ne pas parcourir toute la table à chaque écriture
+        connexion.execute("UPDATE statistiques SET valeur = valeur + ? WHERE nom = 'taille'", (octets,))
+        return connexion.execute("SELECT valeur FROM statistiques WHERE nom = 'taille'").fetchone()[0]
+
+    def _evincer(self, connexion, a_liberer):
+        # Supprime les entrées les moins récemment utilisées jusqu'à libérer assez de place
+        libere = 0
+        cles = []
+        for cle, taille in connexion.execute("SELECT cle, taille FROM resultats ORDER BY dernier_acces"):
+            cles.append((cle,))
+            libere += taille
+            if libere >= a_liberer:
+                break
+        connexion.executemany("DELETE FROM resultats WHERE cle = ?", cles)
+        self._ajouter_taille(connexion, -libere)
+
+    def appeler(self, fonction, *args, **kwargs):
+        """Appelle `fonction` ou renvoie son résultat déjà en cache.
+
+        Un argument `trajectoire` (liste remplie par le solveur) est mis en
+        cache avec le résultat et recopié dans la liste de l'appelant.
+        """
+        trajectoire = kwargs.pop("trajectoire", None)
+        k = cle(fonction, args, {**kwargs, "trajectoire": trajectoire is not None})
+        try:
+            trouve, valeur = self.lire(k)
+        except sqlite3.Error as erreur:
+            LOGGER.warning("Cache indisponible (%s), calcul direct", erreur)
+            trouve = False
+        metriques.noter_cache(trouve)
+        if not trouve:
+            points = [] if trajectoire is not None else None
+            if points is not None:
+                kwargs["trajectoire"] = points
+            valeur = (fonction(*args, **kwargs), points)
+            try:
+                self.ecrire(k, valeur)
+            except sqlite3.Error as erreur:
+                LOGGER.warning("Impossible d'écrire dans le cache (%s)", erreur)
+        resultat, points = valeur
+        if trajectoire is not None:
+            trajectoire.extend(points)
+        return resultat
+
+    def statistiques(self):
+        self.synchroniser()
+        connexion = self._connexion()
+        compteurs = dict(connexion.execute("SELECT nom, valeur FROM statistiques"))
+        entrees = connexion.execute("SELECT COUNT(*) FROM resultats").fetchone()[0]
+        total = compteurs["hits"] + compteurs["misses"]
+        return {
+            "hits": compteurs["hits"],
+            "misses": compteurs["misses"],
+            "taux": compteurs["hits"] / total if total else 0.0,
+            "entrees": entrees,
+            "taille": compteurs["taille"],
+            "taille_max": self.taille_max,
+        }
+
+    def vider(self):
+        with self._verrou:
+            self._compteurs.clear()
+            self._acces.clear()
+        connexion = self._connexion()
+        with connexion:
+            connexion.execute("BEGIN IMMEDIATE")
+            connexion.execute("DELETE FROM resultats")
+            connexion.execute("UPDATE statistiques SET valeur = 0")
+
+
+CACHE = CacheResultats()
+atexit.register(CACHE.synchroniser)
+
+
+def en_cache(fonction, cache=None):
+    """Version de `fonction` dont les résultats passent par le cache (CACHE par défaut)."""
+    @functools.wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        return (cache or CACHE).appeler(fonction, *args, **kwargs)
+    return enveloppe
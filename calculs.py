@@ -0,0 +1,268 @@
+# Pool de processus partagé par toutes les sessions pour les tours de circuit
+#
+# Les calculs avec frottements ne tournent plus dans le thread de la session, où
+# ils se disputeraient le GIL : ils partent dans un pool de processus commun.
+# Deux sessions qui demandent le même tour au même moment attendent le même
+# calcul, et la file d'attente est bornée pour qu'une rafale de clics ne
+# bloque pas le serveur.
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metriques
+
+LOGGER = logging.getLogger(__name__)
+
+# Nombre de processus de calcul ; 0 calcule dans le thread de la session, comme avant
+PROCESSUS = int(os.environ.get("CALCUL_PROCESSUS", min(4, os.cpu_count() or 1)))
+# Tours différents en cours ou en attente au plus ; au-delà, les nouvelles demandes attendent
+FILE_MAX = int(os.environ.get("CALCUL_FILE_MAX", 4 * max(PROCESSUS, 1)))
+ATTENTE_FILE = float(os.environ.get("CALCUL_ATTENTE_FILE", 5))  # Attente maximale d'une place (en s)
+ATTENTE_MAX = float(os.environ.get("CALCUL_ATTENTE_MAX", 120))  # Durée maximale d'un tour (en s)
+
+
+class Surcharge(RuntimeError):
+    """Trop de tours sont déjà en cours de calcul : la demande est refusée plutôt que mise en attente."""
+
+
+# Dans les processus de travail : file où publier chaque segment dès qu'il est calculé
+_avancement = None
+
+
+def _initialiser(file):
+    global _avancement
+    _avancement = file
+
+
+def _calculer_tour(identifiant, voiture, options, nom):
+    """Tour complet calculé dans un processus de travail ; renvoie toutes ses étapes et leurs mesures."""
+    from tour import Tour
+
+    etapes = []
+
+    def publier(etape):
+        etapes.append(etape)
+        if _avancement is not None:
+            _avancement.put((identifiant, etape))
+
+    # L'avancement pendant une partie est publié sans résultats, entre les parties calculées
+    with metriques.collecter() as mesures:
+        for segment, avancement, resultats in Tour.etapes(
+                voiture, options, nom=nom, suivi=lambda segment, avancement: publier((segment.nom, avancement, None))):
+            publier((segment.nom, avancement, dict(resultats)))
+    return etapes, mesures
+
+
+class Calcul:
+    """Tour en cours de calcul dans le pool, partagé par toutes les sessions qui l'ont demandé."""
+
+    def __init__(self, identifiant, cle):
+        self.identifiant = identifiant
+        self.cle = cle
+        self.future = None
+        self.executor = None
+        self._etapes = []
+        self._condition = threading.Condition()
+
+    def _ajouter(self, etape):
+        with self._condition:
+            self._etapes.append(etape)
+            self._condition.notify_all()
+
+    def _terminer(self, future):
+        with self._condition:
+            self._condition.notify_all()
+
+    def suivre(self, delai=ATTENTE_MAX, suivi=None):
+        """Générateur : (nom du segment, avancement, résultats partiels) dès qu'un segment est calculé.
+
+        Les étapes arrivent par la file d'avancement pendant le calcul ; à la
+        fin, celles renvoyées par le processus font foi. L'avancement pendant
+        le calcul d'un segment est transmis à suivi(nom du segment, avancement).
+        """
+        suivantes = 0
+        while True:
+            with self._condition:
+                if not self._condition.wait_for(lambda: len(self._etapes) > suivantes or self.future.done(), delai):
+                    raise TimeoutError(f"Tour non calculé après {delai} s")
+                fini = self.future.done()
+                etapes = self._etapes[suivantes:]
+            if fini:
+                etapes = self.future.result()[0][suivantes:]
+            for nom, avancement, resultats in etapes:
+                suivantes += 1
+                if resultats is not None:
+                    yield nom, avancement, resultats
+                elif suivi is not None:
+                    suivi(nom, avancement)
+            if fini:
+                return
+
+
+class Pool:
+    """Pool de processus avec regroupement des demandes identiques et file bornée."""
+
+    def __init__(self, processus=PROCESSUS, file_max=FILE_MAX, attente_file=ATTENTE_FILE):
+        self.processus = processus
+        self.attente_file = attente_file
+        self._places = threading.BoundedSemaphore(file_max)
+        self._verrou = threading.Lock()
+        self._en_cours = {}      # Clé du tour : Calcul
+        self._identifiants = {}  # Identifiant : Calcul, pour distribuer l'avancement
+        self._compteur = itertools.count()
+        self._executor = None
+        self._file = None
+        self._distributeur = None
+        self.regroupes = 0
+        self.refuses = 0
+
+    def demarrer(self):
+        """Lance les processus de travail et le thread qui distribue l'avancement (une seule fois)."""
+        with self._verrou:
+            if self._executor is None:
+                self._creer()
+        return self
+
+    def _creer(self):
+        # Appelé avec le verrou ; la file et le distributeur survivent à un pool cassé
+        # spawn : le serveur a déjà des threads, qu'un fork copierait dans un état incohérent
+        contexte = multiprocessing.get_context("spawn")
+        if self._file is None:
+            self._file = contexte.Queue()
+            self._distributeur = threading.Thread(target=self._distribuer, daemon=True)
+            self._distributeur.start()
+        self._executor = ProcessPoolExecutor(self.processus, mp_context=contexte,
+                                             initializer=_initialiser, initargs=(self._file,))
+        # Démarre tous les processus maintenant plutôt qu'à la première demande
+        for future in [self._executor.submit(os.getpid) for _ in range(self.processus)]:
+            future.result()
+
+    def _remplacer(self, executor):
+        """Abandonne `executor` si un processus de travail est mort ; le suivant est créé à la demande."""
+        with self._verrou:
+            if self._executor is executor and executor is not None:
+                LOGGER.warning("Un processus de calcul s'est arrêté brutalement, le pool est recréé")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _distribuer(self):
+        while True:
+            try:
+                message = self._file.get()
+            except (EOFError, OSError, ValueError):
+                return  # File fermée à l'arrêt de l'interpréteur
+            if message is None:
+                return
+            identifiant, etape = message
+            with self._verrou:
+                calcul = self._identifiants.get(identifiant)
+            if calcul is not None:
+                calcul._ajouter(etape)
+
+    def soumettre(self, voiture, options, nom=None):
+        """Calcul du tour pour cette voiture et ces options, déjà en cours ou lancé maintenant.
+
+        Lève Surcharge si aucune place ne se libère dans la file en
+        `attente_file` secondes.
+        """
+        self.demarrer()
+        cle = (tuple(sorted(voiture.items())), tuple(sorted(options.items())))
+        with self._verrou:
+            calcul = self._en_cours.get(cle)
+            if calcul is not None:
+                self.regroupes += 1
+                return calcul
+        if not self._places.acquire(timeout=self.attente_file):
+            self.refuses += 1
+            raise Surcharge(f"{len(self._en_cours)} tours déjà en cours de calcul")
+        with self._verrou:
+            # Une autre session a pu lancer le même tour pendant l'attente
+            calcul = self._en_cours.get(cle)
+            if calcul is not None:
+                self._places.release()
+                self.regroupes += 1
+                return calcul
+            calcul = Calcul(next(self._compteur), cle)
+            self._en_cours[cle] = calcul
+            self._identifiants[calcul.identifiant] = calcul
+            try:
+                self._lancer(calcul, dict(voiture), dict(options), nom)
+            except BaseException:
+                del self._en_cours[cle]
+                del self._identifiants[calcul.identifiant]
+                self._places.release()
+                raise
+        calcul.future.add_done_callback(lambda future: self._liberer(calcul, future))
+        return calcul
+
+    def _lancer(self, calcul, voiture, options, nom):
+        # Appelé avec le verrou ; un pool cassé qui n'a pas encore été remplacé l'est ici
+        if self._executor is not None:
+            try:
+                calcul.executor = self._executor
+                calcul.future = self._executor.submit(_calculer_tour, calcul.identifiant, voiture, options, nom)
+                return
+            except BrokenProcessPool:
+                LOGGER.warning("Un processus de calcul s'est arrêté brutalement, le pool est recréé")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+        self._creer()
+        calcul.executor = self._executor
+        calcul.future = self._executor.submit(_calculer_tour, calcul.identifiant, voiture, options, nom)
+
+    def _liberer(self, calcul, future):
+        with self._verrou:
+            del self._en_cours[calcul.cle]
+            del self._identifiants[calcul.identifiant]
+        self._places.release()
+        if not future.cancelled():
+            if future.exception() is None:
+                # Les mesures prises dans le processus de travail rejoignent celles du serveur
+                metriques.REGISTRE.enregistrer(*future.result()[1])
+            elif isinstance(future.exception(), BrokenProcessPool):
+                self._remplacer(calcul.executor)
+        calcul._terminer(future)
+
+    def statistiques(self):
+        with self._verrou:
+            en_cours = len(self._en_cours)
+        return {"processus": self.processus, "en_cours": en_cours, "regroupes": self.regroupes,
+                "refuses": self.refuses}
+
+    def arreter(self):
+        with self._verrou:
+            if self._file is None:
+                return
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            self._file.put(None)
+            self._file = None
+        # Le thread doit s'arrêter avant la fin de l'interpréteur, qui ferme la file
+        self._distributeur.join(timeout=5)
+
+
+POOL = Pool()
+atexit.register(POOL.arreter)
+
+
+def etapes(voiture, options, nom=None, suivi=None):
+    """Générateur : (nom du segment, avancement, résultats partiels), comme Tour.etapes.
+
+    Le tour est calculé dans le pool partagé, ou dans le thread appelant si
+    CALCUL_PROCESSUS=0. `nom` identifie la voiture dans les mesures ;
+    suivi(nom du segment, avancement) suit l'avancement pendant le calcul
+    d'un segment.
+    """
+    if PROCESSUS <= 0:
+        from tour import Tour
+
+        rappel = None if suivi is None else lambda segment, avancement: suivi(segment.nom, avancement)
+        for segment, avancement, resultats in Tour.etapes(voiture, options, nom=nom, suivi=rappel):
+            yield segment.nom, avancement, resultats
+        return
+    yield from POOL.soumettre(voiture, options, nom).suivre(suivi=suivi)
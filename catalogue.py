@@ -0,0 +1,138 @@
+# Catalogue des voitures : lu une seule fois, relu seulement quand le fichier CSV change
+import csv
+import os
+import threading
+
+from solveurs import MU, facteur_trainee
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+FICHIER_VOITURES = os.path.join(DOSSIER, "caracteristiques_voitures.csv")
+
+# Attribut de Voiture : colonne du fichier CSV
+COLONNES = {
+    "masse": "Masse (kg)",
+    "acceleration": "Accélération moyenne (m/s²)",
+    "l": "Longueur (m)",
+    "L": "Largeur (m)",
+    "h": "Hauteur (m)",
+    "Cx": "Cx",
+    "Cz": "Cz",
+    "mu": "µ",
+}
+# Caractéristiques passées aux solveurs (arguments de simuler_circuit), sans µ
+COLONNES_VOITURE = {attribut: colonne for attribut, colonne in COLONNES.items() if attribut != "mu"}
+
+
+class Voiture:
+    """Caractéristiques d'une voiture du catalogue.
+
+    La surface frontale et le facteur de traînée 1/2 ρ S sont calculés une
+    fois pour toutes ; k = facteur_trainee * Cx, avec le Cx effectif (ailerons).
+    """
+    __slots__ = ("modele", "nom", *COLONNES, "surface_frontale", "facteur_trainee")
+
+    def __init__(self, modele, nom, masse, acceleration, l, L, h, Cx, Cz, mu=MU):
+        self.modele = modele
+        self.nom = nom
+        self.masse = masse
+        self.acceleration = acceleration
+        self.l = l
+        self.L = L
+        self.h = h
+        self.Cx = Cx
+        self.Cz = Cz
+        self.mu = mu
+        self.surface_frontale = L * h
+        self.facteur_trainee = facteur_trainee(L, h)
+
+    def caracteristiques(self):
+        """Arguments de solveurs.simuler_circuit pour cette voiture."""
+        return {attribut: getattr(self, attribut) for attribut in COLONNES_VOITURE}
+
+    def fiche(self):
+        """Caractéristiques sous les noms des colonnes du fichier, pour l'affichage."""
+        return {colonne: getattr(self, attribut) for attribut, colonne in COLONNES.items()}
+
+    def __repr__(self):
+        return f"Voiture({self.nom!r}, masse={self.masse}, acceleration={self.acceleration})"
+
+
+class Catalogue:
+    """Voitures lues depuis le fichier CSV, accessibles par leur nom en temps constant."""
+
+    def __init__(self, voitures, date_modification=None):
+        self.voitures = list(voitures)
+        self.date_modification = date_modification
+        self._index = {voiture.nom: i for i, voiture in enumerate(self.voitures)}
+        self._tableau = None
+
+    @property
+    def noms(self):
+        return [voiture.nom for voiture in self.voitures]
+
+    def position(self, nom):
+        return self._index[nom]
+
+    def __getitem__(self, nom):
+        return self.voitures[self._index[nom]]
+
+    def __contains__(self, nom):
+        return nom in self._index
+
+    def __iter__(self):
+        return iter(self.voitures)
+
+    def __len__(self):
+        return len(self.voitures)
+
+    def tableau(self):
+        """Le catalogue sous forme de DataFrame (comme le lisait pd.read_csv), construit une seule fois."""
+        if self._tableau is None:
+            import pandas as pd
+
+            self._tableau = pd.DataFrame(
+                {"Nom": self.noms, **{colonne: [getattr(v, attribut) for v in self.voitures]
+                                      for attribut, colonne in COLONNES.items()}},
+                index=[voiture.modele for voiture in self.voitures])
+        return self._tableau
+
+
+def lire(chemin=FICHIER_VOITURES):
+    """Lit le fichier CSV des voitures.
+
+    Les lignes ont une colonne de plus que l'en-tête : la première donne le
+    modèle (« Modèle 1 »…), les suivantes correspondent aux colonnes nommées.
+    """
+    voitures = []
+    with open(chemin, newline="", encoding="utf-8") as fichier:
+        lecteur = csv.reader(fichier)
+        entete = next(lecteur)
+        for numero, ligne in enumerate(lecteur):
+            if not ligne:
+                continue
+            modele = ligne[0] if len(ligne) == len(entete) + 1 else str(numero)
+            valeurs = dict(zip(entete, ligne[len(ligne) - len(entete):]))
+            voitures.append(Voiture(modele, valeurs["Nom"],
+                                    **{attribut: float(valeurs[colonne]) for attribut, colonne in COLONNES.items()
+                                       if colonne in valeurs}))
+    return voitures
+
+
+_CATALOGUES = {}
+_VERROU = threading.Lock()
+
+
+def charger(chemin=FICHIER_VOITURES):
+    """Catalogue du fichier `chemin`, partagé par tout le processus.
+
+    Le fichier n'est relu que si sa date de modification a changé.
+    """
+    date = os.stat(chemin).st_mtime_ns
+    catalogue = _CATALOGUES.get(chemin)
+    if catalogue is None or catalogue.date_modification != date:
+        with _VERROU:
+            catalogue = _CATALOGUES.get(chemin)
+            if catalogue is None or catalogue.date_modification != date:
+                catalogue = Catalogue(lire(chemin), date)
+                _CATALOGUES[chemin] = catalogue
+    return catalogue
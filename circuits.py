@@ -0,0 +1,271 @@
+# Circuits décrits dans des fichiers JSON ou TOML, compilés en une suite de segments
+#
+# Un circuit est une liste ordonnée de segments typés :
+#   pente         longueur (m), angle (degrés)
+#   looping       rayon (m)
+#   ravin         longueur (m), vitesse_min (m/s, V_MIN_RAVIN par défaut)
+#   ligne_droite  longueur (m)
+# Chaque segment peut recevoir un `nom` (par défaut type_numéro).
+#
+# Exemple :
+#   python circuits.py circuits/double_looping.toml --voiture "Mazda RX-7 FD" --frottements
+import argparse
+import json
+import math as mt
+import os
+import threading
+import tomllib
+from collections import namedtuple
+
+import metriques
+import solveurs
+from solveurs import (G, MU, RHO, V_MIN_RAVIN, RECORD, appliquer_options, facteur_trainee, integrer_segment,
+                      temps_parcours)
+
+PAS_SUIVI = 0.01  # Progression minimale (part du circuit) entre deux appels de `suivi` dans un segment
+DOSSIER_CIRCUITS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "circuits")
+FICHIER_CIRCUIT = os.path.join(DOSSIER_CIRCUITS, "livrable.json")
+
+# État de la voiture transmis d'un segment au suivant
+Etat = namedtuple("Etat", ["v", "t", "position"])
+# `parcourir(v_initial, acceleration, parametres)` renvoie (vitesse, durée) en sortie du segment ;
+# `parametres` garde ceux de la description (rayon, longueur…) pour les graphiques et les pages
+Segment = namedtuple("Segment", ["nom", "type", "longueur", "vitesse_min", "option_nos", "parcourir", "parametres"])
+# Voiture une fois les accessoires pris en compte, commune à tous les segments
+Parametres = namedtuple("Parametres", ["masse", "l", "L", "h", "Cx", "Cz", "k", "frottements", "calcul"])
+
+
+def _accelerer(a, v_initial, distance):
+    t = temps_parcours(a, v_initial, distance)
+    if t == mt.inf:
+        return 0.0, t
+    return a * t + v_initial, t
+
+
+def _pente(longueur, angle):
+    sinus = mt.sin(mt.radians(angle))
+
+    def parcourir(v_initial, acceleration, p):
+        if p.frottements:
+            a0 = G * sinus + acceleration - 0.1 * (G * sinus)
+            return p.calcul(integrer_segment, a0, p.k / p.masse, v_initial, longueur)
+        return _accelerer(G * sinus + acceleration, v_initial, longueur)
+
+    return longueur, None, parcourir
+
+
+def _looping(rayon):
+    def parcourir(v_initial, acceleration, p):
+        if p.frottements:
+            return p.calcul(solveurs.vitesse_looping_frottement, G, p.masse, acceleration, v_initial, MU, RHO, p.Cx,
+                            p.L, p.h, rayon=rayon)
+        return p.calcul(solveurs.vitesse_looping, G, p.masse, acceleration, v_initial, rayon=rayon)
+
+    return 2 * mt.pi * rayon, mt.sqrt(G * rayon), parcourir
+
+
+def _ravin(longueur, vitesse_min=V_MIN_RAVIN):
+    # Solution exacte, plus rapide à recalculer qu'à relire dans le cache
+    def parcourir(v_initial, acceleration, p):
+        if p.frottements:
+            return solveurs.vitesse_ravin_frottement(v_initial, G, p.masse, p.l, p.L, p.h, p.Cx, p.Cz,
+                                                     longueur=longueur)
+        return solveurs.vitesse_ravin(v_initial, longueur=longueur)
+
+    return longueur, vitesse_min, parcourir
+
+
+def _ligne_droite(longueur):
+    def parcourir(v_initial, acceleration, p):
+        if p.frottements:
+            return p.calcul(integrer_segment, acceleration - 0.1 * G, p.k / p.masse, v_initial, longueur)
+        return _accelerer(acceleration, v_initial, longueur)
+
+    return longueur, None, parcourir
+
+
+# Type de segment : (fonction de compilation, option de NOS qui s'y applique)
+TYPES = {
+    "pente": (_pente, "nos_pente"),
+    "looping": (_looping, "nos_looping"),
+    "ravin": (_ravin, None),
+    "ligne_droite": (_ligne_droite, "nos_piste"),
+}
+
+
+class Circuit:
+    """Circuit compilé : les segments sont prêts à être enchaînés pour n'importe quelle voiture."""
+
+    def __init__(self, nom, segments, record=RECORD):
+        self.nom = nom
+        self.segments = segments
+        self.record = record
+
+    def segment(self, nom):
+        """Segment nommé `nom` ; lève KeyError s'il n'est pas dans le circuit."""
+        for segment in self.segments:
+            if segment.nom == nom:
+                return segment
+        raise KeyError(f"Pas de segment {nom!r} dans le circuit {self.nom}")
+
+    def parcourir(self, masse, acceleration, l, L, h, Cx, Cz, nos_pente=False, nos_looping=False, nos_piste=False,
+                  ailerons=False, frottements=False, cache=None, voiture=None, suivi=None, debut=0, etat=None):
+        """Générateur : (segment, vitesse d'entrée, durée, état en sortie) pour chaque segment, dans l'ordre.
+
+        Le parcours commence au segment d'indice `debut`, où la voiture entre
+        dans l'état `etat` (à l'arrêt au départ du circuit par défaut).
+
+        Si `cache` est donné, les segments calculés par intégration passent
+        par ce cache, comme dans solveurs.simuler_circuit ; le ravin, qui a
+        une solution exacte, est toujours recalculé. Chaque segment est
+        mesuré (voir metriques) sous le nom de voiture `voiture`. Si `suivi`
+        est donné, suivi(segment, position) reçoit la position de la voiture
+        (en m depuis le départ) à chaque pas des segments intégrés pas à pas.
+        """
+        def calcul(fonction, *args, **kwargs):
+            return cache.appeler(fonction, *args, **kwargs) if cache is not None else fonction(*args, **kwargs)
+
+        masse, acceleration_pente, acceleration_looping, acceleration_piste, Cx, Cz = appliquer_options(
+            masse, acceleration, Cx, Cz, nos_pente, nos_looping, nos_piste, ailerons)
+        accelerations = {None: acceleration, "nos_pente": acceleration_pente, "nos_looping": acceleration_looping,
+                         "nos_piste": acceleration_piste}
+        p = Parametres(masse, l, L, h, Cx, Cz, facteur_trainee(L, h) * Cx, frottements, calcul)
+
+        etat = Etat(0.0, 0.0, 0.0) if etat is None else etat
+        for segment in self.segments[debut:]:
+            depart = etat.position
+            rappel = None if suivi is None else lambda fraction: suivi(segment, depart + fraction * segment.longueur)
+            with solveurs.suivre(rappel), metriques.mesurer(segment.nom, segment.type, voiture):
+                v, duree = segment.parcourir(etat.v, accelerations[segment.option_nos], p)
+            v_entree = etat.v
+            etat = Etat(v, etat.t + duree, etat.position + segment.longueur)
+            yield segment, v_entree, duree, etat
+
+    def longueur(self):
+        """Longueur totale du circuit (en m), looping compris."""
+        return sum(segment.longueur for segment in self.segments)
+
+    def etapes(self, *args, suivi=None, **kwargs):
+        """Générateur : (segment, avancement, résultats) dès que chaque segment est calculé.
+
+        L'avancement est la part de la longueur du circuit déjà parcourue,
+        entre 0 et 1. Les résultats ont la forme de ceux de simuler, limités
+        aux segments déjà parcourus (à partir de `debut`, voir parcourir) : temps_total est le chrono en sortie du
+        segment et resultat n'apparaît qu'avec le dernier. Le même
+        dictionnaire est complété à chaque étape.
+
+        Si `suivi` est donné, suivi(segment, avancement) est appelé pendant le
+        calcul des segments intégrés pas à pas, dès que l'avancement a gagné
+        PAS_SUIVI depuis le dernier appel.
+        """
+        longueur = self.longueur()
+        if suivi is not None:
+            dernier_suivi = [0.0]
+
+            def suivre(segment, position):
+                if position / longueur >= dernier_suivi[0] + PAS_SUIVI:
+                    dernier_suivi[0] = position / longueur
+                    suivi(segment, dernier_suivi[0])
+
+            kwargs["suivi"] = suivre
+        resultats = {}
+        crash = False
+        marge = True
+        dernier = self.segments[-1]
+        for segment, v_entree, duree, etat in self.parcourir(*args, **kwargs):
+            resultats["v_" + segment.nom] = etat.v
+            resultats["temps_" + segment.nom] = duree
+            resultats["temps_total"] = etat.t
+            if segment.vitesse_min is not None:
+                crash |= segment.vitesse_min > v_entree
+                marge &= segment.vitesse_min < v_entree
+            if segment is dernier:
+                if etat.t < self.record and marge:
+                    resultats["resultat"] = "RECORD BATTU"
+                elif crash:
+                    resultats["resultat"] = "CRASH"
+                else:
+                    resultats["resultat"] = "RECORD RATÉ"
+            yield segment, min(etat.position / longueur, 1.0), resultats
+
+    def simuler(self, *args, **kwargs):
+        """Enchaîne tous les segments ; renvoie un dictionnaire comme solveurs.simuler_circuit.
+
+        Pour chaque segment : v_<nom> et temps_<nom>, puis temps_total et
+        resultat. La voiture se crashe si elle entre dans un segment moins
+        vite que sa vitesse minimale.
+        """
+        for _, _, resultats in self.etapes(*args, **kwargs):
+            pass
+        return resultats
+
+
+def compiler(description):
+    """Circuit compilé à partir de sa description (dictionnaire lu dans un fichier JSON ou TOML)."""
+    if not description.get("segments"):
+        raise ValueError("Le circuit doit contenir au moins un segment")
+    segments = []
+    noms = set()
+    for numero, parametres in enumerate(description["segments"], start=1):
+        parametres = dict(parametres)
+        type_segment = parametres.pop("type", None)
+        if type_segment not in TYPES:
+            raise ValueError(f"Segment {numero} : type inconnu {type_segment!r} (attendu : {', '.join(TYPES)})")
+        nom = parametres.pop("nom", f"{type_segment}_{numero}")
+        if nom in noms:
+            raise ValueError(f"Segment {numero} : le nom {nom!r} est déjà utilisé")
+        noms.add(nom)
+        compilation, option_nos = TYPES[type_segment]
+        try:
+            longueur, vitesse_min, parcourir = compilation(**parametres)
+        except TypeError as erreur:
+            raise ValueError(f"Segment {numero} ({type_segment}) : paramètres invalides ({erreur})") from None
+        segments.append(Segment(nom, type_segment, longueur, vitesse_min, option_nos, parcourir, parametres))
+    return Circuit(description.get("nom", "Circuit"), segments, description.get("record", RECORD))
+
+
+def lire(chemin):
+    """Description du circuit contenue dans un fichier .json ou .toml."""
+    if chemin.endswith(".toml"):
+        with open(chemin, "rb") as fichier:
+            return tomllib.load(fichier)
+    with open(chemin, encoding="utf-8") as fichier:
+        return json.load(fichier)
+
+
+_CIRCUITS = {}
+_VERROU = threading.Lock()
+
+
+def charger(chemin=None):
+    """Circuit compilé du fichier `chemin` (FICHIER_CIRCUIT par défaut), recompilé seulement si le fichier a changé."""
+    chemin = FICHIER_CIRCUIT if chemin is None else chemin
+    date = os.stat(chemin).st_mtime_ns
+    with _VERROU:
+        if chemin not in _CIRCUITS or _CIRCUITS[chemin][0] != date:
+            _CIRCUITS[chemin] = (date, compiler(lire(chemin)))
+        return _CIRCUITS[chemin][1]
+
+
+def main(arguments=None):
+    import catalogue
+
+    parser = argparse.ArgumentParser(description="Simule une voiture du catalogue sur un circuit décrit dans un fichier.")
+    parser.add_argument("circuit", nargs="?", default=FICHIER_CIRCUIT, help="fichier .json ou .toml du circuit")
+    parser.add_argument("--voiture", help="nom de la voiture (la première du catalogue par défaut)")
+    for option in ["nos_pente", "nos_looping", "nos_piste", "ailerons", "frottements"]:
+        parser.add_argument("--" + option, action="store_true")
+    args = parser.parse_args(arguments)
+
+    voitures = catalogue.charger()
+    voiture = voitures[args.voiture] if args.voiture else voitures.voitures[0]
+    options = {o: getattr(args, o) for o in ["nos_pente", "nos_looping", "nos_piste", "ailerons", "frottements"]}
+    circuit = charger(args.circuit)
+    print(f"{circuit.nom} — {voiture.nom}")
+    for segment, v_entree, duree, etat in circuit.parcourir(**voiture.caracteristiques(), **options):
+        print(f"  {segment.nom:<16} {etat.v:8.2f} m/s {duree:7.3f} s   total {etat.t:7.3f} s {etat.position:8.1f} m")
+    print(circuit.simuler(**voiture.caracteristiques(), **options)["resultat"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Réduction du nombre de points envoyés aux graphiques
+import numpy as np
+
+# Nombre de points gardés par défaut : à peu près un par pixel de largeur de graphique
+POINTS_MAX = 650
+
+
+def lttb(x, y, seuil=POINTS_MAX):
+    """Indices des points gardés par l'algorithme Largest-Triangle-Three-Buckets.
+
+    Les points (triés selon x) sont répartis en `seuil - 2` paquets ; dans
+    chacun on garde le point qui forme le plus grand triangle avec le point
+    gardé précédemment et la moyenne du paquet suivant. Le premier et le
+    dernier point sont toujours gardés, ce qui conserve l'allure de la courbe.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if seuil >= n or seuil < 3:
+        return np.arange(n)
+
+    indices = np.empty(seuil, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    taille = (n - 2) / (seuil - 2)
+    a = 0
+    for i in range(seuil - 2):
+        debut = int(i * taille) + 1
+        fin = int((i + 1) * taille) + 1
+        suivant_fin = min(int((i + 2) * taille) + 1, n)
+        moyenne_x = x[fin:suivant_fin].mean()
+        moyenne_y = y[fin:suivant_fin].mean()
+        aires = np.abs((x[a] - moyenne_x) * (y[debut:fin] - y[a]) - (x[a] - x[debut:fin]) * (moyenne_y - y[a]))
+        a = debut + int(np.argmax(aires))
+        indices[i + 1] = a
+    return indices
+
+
+def decimer(df, x, y, seuil=POINTS_MAX):
+    """Garde au plus `seuil` lignes de `df` en préservant l'allure de la courbe y(x)."""
+    if len(df) <= seuil:
+        return df
+    return df.iloc[lttb(df[x].to_numpy(), df[y].to_numpy(), seuil)]
@@ -0,0 +1,105 @@
+# Démarrage du serveur : préchauffage et mesure du temps d'import de chaque module
+#
+# Exemple :
+#   python demarrage.py                 # temps d'import de chaque module
+#   python demarrage.py --prechauffer   # remplit les caches sur disque avant de lancer le serveur
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+FICHIER_VOITURES = os.path.join(DOSSIER, "caracteristiques_voitures.csv")
+# Préchauffage au lancement de l'application, désactivable avec PRECHAUFFAGE=0
+PRECHAUFFAGE = os.environ.get("PRECHAUFFAGE", "1") != "0"
+# Compilation des noyaux Numba (methode="euler") pendant ce préchauffage, sur demande avec PRECHAUFFAGE_NOYAUX=1
+PRECHAUFFAGE_NOYAUX = os.environ.get("PRECHAUFFAGE_NOYAUX", "0") != "0"
+
+# Modules mesurés par défaut : ceux de l'application, puis les bibliothèques lourdes
+MODULES = ["Hello", "solveurs", "cache_resultats", "decimation", "circuits", "tour", "calculs", "metriques", "flotte", "inverse", "monte_carlo",
+           "noyaux", "streamlit", "pandas", "numpy", "scipy.optimize", "scipy.integrate", "altair", "pydeck",
+           "numba"]
+
+
+def prechauffer(fichier_voitures=FICHIER_VOITURES, compiler_noyaux=PRECHAUFFAGE_NOYAUX):
+    """Prépare un serveur qui démarre : modules différés, catalogue, un tour de circuit, images.
+
+    Le tour de la première voiture, celle affichée à l'ouverture, est calculé
+    sans puis avec frottements par Tour.calculer, comme dans l'application :
+    ses résultats sont dans le cache sur disque sous les mêmes clés. Les
+    noyaux compilés, qui ne servent qu'à methode="euler", ne sont compilés
+    que si `compiler_noyaux` est vrai (PRECHAUFFAGE_NOYAUX=1, ou --prechauffer).
+    """
+    debut = time.perf_counter()
+    import catalogue
+    import flotte  # noqa: F401 (numpy et pandas, utilisés par le classement)
+    import inverse  # noqa: F401 (scipy.optimize)
+    import medias
+    from tour import Tour
+
+    voiture = catalogue.charger(fichier_voitures).voitures[0]
+    for frottements in (False, True):
+        options = dict(nos_pente=False, nos_looping=False, nos_piste=False, ailerons=False, frottements=frottements)
+        Tour.calculer(voiture.caracteristiques(), options, nom=voiture.nom)
+    for nom in medias.preparees():
+        medias.lire(nom)
+    if compiler_noyaux:
+        import noyaux
+
+        noyaux.prechauffer()  # Compilés une fois, relus ensuite dans le cache de Numba
+    LOGGER.info("Serveur préchauffé en %.2f s", time.perf_counter() - debut)
+
+
+def temps_import(module):
+    """Durée d'import de `module` dans un interpréteur neuf (en s), avec le détail de ses imports directs.
+
+    Renvoie (durée totale, [(sous-module, durée), ...]) d'après `python -X importtime`.
+    """
+    sortie = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=DOSSIER)
+    if sortie.returncode != 0:
+        raise ImportError(f"Impossible d'importer {module}")
+    lignes = [ligne[len("import time:"):].split("|") for ligne in sortie.stderr.splitlines()
+              if ligne.startswith("import time:") and "cumulative" not in ligne]
+    # Les sous-imports sont listés juste avant le module, indentés ; les imports directs
+    # sont ceux d'un cran de plus ; on s'arrête au module précédent, au premier niveau
+    *sous_modules, (_, total, _) = lignes
+    detail = []
+    for _, cumul, nom in reversed(sous_modules):
+        niveau = len(nom) - len(nom.lstrip())
+        if niveau == 1:
+            break
+        if niveau == 3:
+            detail.append((nom.strip(), int(cumul) / 1e6))
+    return int(total) / 1e6, sorted(detail, key=lambda d: -d[1])
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Temps d'import des modules et préchauffage du serveur.")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules à mesurer")
+    parser.add_argument("--detail", type=int, default=5, help="nombre d'imports directs détaillés par module")
+    parser.add_argument("--prechauffer", action="store_true", help="préchauffe les caches sur disque et quitte")
+    args = parser.parse_args(arguments)
+
+    if args.prechauffer:
+        logging.basicConfig(level=logging.INFO)
+        prechauffer(compiler_noyaux=True)
+        return
+
+    for module in args.modules:
+        try:
+            total, detail = temps_import(module)
+        except ImportError as erreur:
+            print(f"{module:<20} {erreur}")
+            continue
+        print(f"{module:<20} {1e3 * total:8.1f} ms")
+        for nom, duree in detail[:args.detail]:
+            print(f"  {nom:<30} {1e3 * duree:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
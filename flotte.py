@@ -0,0 +1,326 @@
+# Simulation vectorisée de toute la flotte sur le circuit complet
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import circuits
+import solveurs
+from catalogue import COLONNES_VOITURE
+from solveurs import (G, RHO, MU, SIN_PENTE, LONGUEUR_PENTE, LONGUEUR_PISTE, LONGUEUR_RAVIN, RAYON_LOOPING,
+                      BONUS_NOS, BONUS_CX_AILERONS, BONUS_CZ_AILERONS, MASSE_AILERONS,
+                      RTOL, ATOL, T_MAX, facteur_trainee)
+
+OPTIONS = ["nos_pente", "nos_looping", "nos_piste", "ailerons", "frottements"]
+RESULTATS = ["RECORD BATTU", "RECORD RATÉ", "CRASH"]
+
+
+def integrer_vectorise(f, y0, y1, evenements, parametres=(), t_max=T_MAX, rtol=RTOL, atol=ATOL):
+    """Version vectorisée de solveurs.integrer.
+
+    Chaque case des tableaux est une simulation indépendante, avec son propre
+    pas de temps ; `f` et les événements reçoivent en plus les `parametres`
+    propres à chaque simulation. Renvoie (indice de l'événement déclenché,
+    -1 si aucun, t, y0, y1) sous forme de tableaux.
+    """
+    y0, y1 = (np.array(y, dtype=float) for y in np.broadcast_arrays(y0, y1))
+    n = y0.size
+    p = tuple(np.broadcast_to(np.asarray(q, dtype=float), (n,)) for q in parametres)
+
+    evenement = np.full(n, -1)
+    t_fin, y0_fin, y1_fin = np.zeros(n), y0.copy(), y1.copy()
+
+    # Les tableaux suivants ne gardent que les simulations encore en cours
+    indices = np.arange(n)
+    t = np.zeros(n)
+    h = np.full(n, 1e-3)
+    k1 = f(t, y0, y1, *p)
+    valeurs = [e(t, y0, y1, *p) for e in evenements]
+
+    def fp(*q):
+        return lambda tt, a, b: f(tt, a, b, *q)
+
+    while indices.size:
+        h = np.minimum(h, t_max - t)
+        z0, z1, e0, e1, k7 = solveurs.pas_dopri(fp(*p), t, y0, y1, h, k1)
+        s0 = atol + rtol * np.maximum(np.abs(y0), np.abs(z0))
+        s1 = atol + rtol * np.maximum(np.abs(y1), np.abs(z1))
+        erreur = np.sqrt(0.5 * ((e0 / s0) ** 2 + (e1 / s1) ** 2))
+        with np.errstate(divide="ignore"):
+            facteur = 0.9 * erreur ** -0.2
+        accepte = erreur <= 1
+
+        nouvelles = [e(t + h, z0, z1, *p) for e in evenements]
+        croise = np.full(indices.size, -1)
+        for i in reversed(range(len(evenements))):
+            croise[accepte & (valeurs[i] < 0) & (nouvelles[i] >= 0)] = i
+
+        j = np.nonzero(croise >= 0)[0]
+        if j.size:
+            # Méthode d'Illinois sur la durée du dernier pas, comme en scalaire
+            pj = tuple(q[j] for q in p)
+            tj, aj, bj = t[j], y0[j], y1[j]
+            kj = (k1[0][j], k1[1][j])
+            ev = croise[j]
+            colonnes = np.arange(j.size)
+            bas, haut = np.zeros(j.size), h[j].copy()
+            e_bas = np.choose(ev, [v[j] for v in valeurs])
+            e_haut = np.choose(ev, [v[j] for v in nouvelles])
+            cote = np.zeros(j.size)
+            en_cours = np.ones(j.size, dtype=bool)
+            s_fin, u0_fin, u1_fin = haut.copy(), z0[j], z1[j]
+            for _ in range(60):
+                s = (bas * e_haut - haut * e_bas) / (e_haut - e_bas)
+                u0, u1, _e0, _e1, _k = solveurs.pas_dopri(fp(*pj), tj, aj, bj, s, kj)
+                e_s = np.array([e(tj + s, u0, u1, *pj) for e in evenements])[ev, colonnes]
+                vers_bas = en_cours & (e_s < 0)
+                vers_haut = en_cours & (e_s >= 0)
+                e_haut = np.where(vers_bas & (cote == -1), 0.5 * e_haut, e_haut)
+                e_bas = np.where(vers_haut & (cote == 1), 0.5 * e_bas, e_bas)
+                bas, e_bas = np.where(vers_bas, s, bas), np.where(vers_bas, e_s, e_bas)
+                haut, e_haut = np.where(vers_haut, s, haut), np.where(vers_haut, e_s, e_haut)
+                cote = np.where(vers_bas, -1, np.where(vers_haut, 1, cote))
+                s_fin = np.where(en_cours, s, s_fin)
+                u0_fin = np.where(en_cours, u0, u0_fin)
+                u1_fin = np.where(en_cours, u1, u1_fin)
+                en_cours &= ~((haut - bas <= 1e-14 * (1 + tj)) | (e_s == 0))
+                if not en_cours.any():
+                    break
+            k = indices[j]
+            evenement[k] = ev
+            t_fin[k], y0_fin[k], y1_fin[k] = tj + s_fin, u0_fin, u1_fin
+
+        avance = accepte & (croise < 0)
+        t = np.where(avance, t + h, t)
+        y0, y1 = np.where(avance, z0, y0), np.where(avance, z1, y1)
+        k1 = (np.where(avance, k7[0], k1[0]), np.where(avance, k7[1], k1[1]))
+        valeurs = [np.where(avance, nv, v) for v, nv in zip(valeurs, nouvelles)]
+        h = np.where(accepte, h * np.minimum(5.0, facteur), h * np.maximum(0.2, facteur))
+
+        # Simulations terminées : événement déclenché ou durée maximale atteinte
+        expire = avance & (t >= t_max)
+        k = indices[expire]
+        t_fin[k], y0_fin[k], y1_fin[k] = t[expire], y0[expire], y1[expire]
+        garde = (croise < 0) & ~expire
+        if not garde.all():
+            indices, t, h, y0, y1 = indices[garde], t[garde], h[garde], y0[garde], y1[garde]
+            k1 = (k1[0][garde], k1[1][garde])
+            valeurs = [v[garde] for v in valeurs]
+            p = tuple(q[garde] for q in p)
+
+    return evenement, t_fin, y0_fin, y1_fin
+
+
+def temps_parcours(a, v_initial, distance):
+    """Version vectorisée de solveurs.temps_parcours."""
+    discriminant = v_initial * v_initial + 2 * a * distance
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denominateur = v_initial + np.sqrt(np.maximum(discriminant, 0))
+        return np.where((discriminant >= 0) & (denominateur > 0), 2 * distance / denominateur, np.inf)
+
+
+def _derivees_segment(t, v, OM, a0, k_sur_m, distance):
+    return a0 - k_sur_m * v * v, v
+
+
+def _fin_segment(t, v, OM, a0, k_sur_m, distance):
+    return OM - distance
+
+
+def _arret_voiture(t, v, OM, a0, k_sur_m, distance):
+    return -v
+
+
+def segment_frottement(a0, k_sur_m, v_initial, distance, rtol=RTOL, atol=ATOL):
+    """Intègre dv/dt = a0 - (k/m) v² pour chaque case jusqu'à `distance`."""
+    evenement, t, v, OM = integrer_vectorise(_derivees_segment, v_initial, np.zeros_like(a0),
+                                             (_fin_segment, _arret_voiture), (a0, k_sur_m, distance),
+                                             rtol=rtol, atol=atol)
+    arrive = evenement == 0
+    return np.where(arrive, v, 0.0), np.where(arrive, t, np.inf)
+
+
+def segment(a, v_initial, distance):
+    """Segment à accélération constante, en forme fermée."""
+    t = temps_parcours(a, v_initial, distance)
+    return np.where(np.isinf(t), 0.0, a * np.where(np.isinf(t), 0.0, t) + v_initial), t
+
+
+def vitesse_pente(g, masse, acceleration, l, L, h, Cx, frottements, rtol=RTOL, atol=ATOL, mu=MU, v_initial=0.0,
+                  longueur=LONGUEUR_PENTE, sinus=SIN_PENTE):
+    v_initial = np.broadcast_to(v_initial, np.shape(masse))
+    v, t = segment(g * sinus + acceleration, v_initial, longueur)
+    if frottements.any():
+        i = frottements
+        k = facteur_trainee(L[i], h[i]) * Cx[i]
+        a0 = g * sinus + acceleration[i] - np.broadcast_to(mu, i.shape)[i] * (g * sinus)
+        v[i], t[i] = segment_frottement(a0, k / masse[i], v_initial[i], longueur, rtol, atol)
+    return v, t
+
+
+def vitesse_piste(g, masse, acceleration, v_initial, l, L, h, Cx, frottements, rtol=RTOL, atol=ATOL, mu=MU,
+                  longueur=LONGUEUR_PISTE):
+    v, t = segment(acceleration, v_initial, longueur)
+    if frottements.any():
+        i = frottements
+        k = facteur_trainee(L[i], h[i]) * Cx[i]
+        a0 = acceleration[i] - np.broadcast_to(mu, i.shape)[i] * g
+        v[i], t[i] = segment_frottement(a0, k / masse[i], v_initial[i], longueur, rtol, atol)
+    return v, t
+
+
+def _derivees_looping(t, theta, theta_dot, masse, g, F, c, r):
+    return theta_dot, (-masse * g * np.sin(theta) - c * (r * theta_dot ** 2) + F) / (masse * r)
+
+
+def _sortie_looping(t, theta, theta_dot, masse, g, F, c, r):
+    return theta - 2 * np.pi
+
+
+def _calage(t, theta, theta_dot, masse, g, F, c, r):
+    return -theta_dot
+
+
+def vitesse_looping(g, masse, acceleration, v_initial, L, h, Cx, frottements, rtol=RTOL, atol=ATOL, mu=MU,
+                    rayon=RAYON_LOOPING):
+    # Sans frottements le terme en theta_dot² vaut 0.5 + 1 ; avec, 0.5 Cx rho Sx + mu
+    c = np.where(frottements, 0.5 * Cx * RHO * (L * h) + mu, 1.5)
+    evenement, t, theta, theta_dot = integrer_vectorise(
+        _derivees_looping, np.zeros_like(v_initial), v_initial / rayon,
+        (_sortie_looping, _calage), (masse, g, acceleration, c, rayon), rtol=rtol, atol=atol)
+    return np.where(evenement == 0, rayon * theta_dot, 0.0), t
+
+
+def vitesse_ravin(g, masse, v_initial, l, L, h, Cx, Cz, frottements, longueur=LONGUEUR_RAVIN):
+    # Sans frottements x = v0 t ; avec, dvx/dt = -(kx/m) vx² donne
+    # x(t) = ln(1 + kx v0 t / m) m / kx, inversé directement pour x = longueur
+    possible = v_initial > 0
+    v0 = np.where(possible, v_initial, 1.0)
+    k_sur_m = np.where(frottements, 0.5 * (RHO * l * h * Cx) / masse, 0.0)
+    kd = k_sur_m * longueur
+    t = np.where(kd > 0, np.expm1(kd) / np.where(kd > 0, k_sur_m, 1.0) / v0, longueur / v0)
+    v = v0 * np.exp(-kd)
+    return np.where(possible, v, 0.0), np.where(possible, t, 0.0)
+
+
+def grille_configurations(**options):
+    """Produit cartésien des options ; par défaut chaque option vaut False puis True."""
+    valeurs = [options.get(option, [False, True]) for option in OPTIONS]
+    return pd.DataFrame(list(itertools.product(*valeurs)), columns=OPTIONS)
+
+
+def _segment_lot(segment, g, masse, acceleration, v_initial, l, L, h, Cx, Cz, frottements, rtol, atol, mu):
+    """Vitesse en sortie et durée d'un segment de circuit compilé, pour tout le lot."""
+    p = segment.parametres
+    if segment.type == "pente":
+        return vitesse_pente(g, masse, acceleration, l, L, h, Cx, frottements, rtol, atol, mu, v_initial,
+                             p["longueur"], np.sin(np.radians(p["angle"])))
+    if segment.type == "looping":
+        return vitesse_looping(g, masse, acceleration, v_initial, L, h, Cx, frottements, rtol, atol, mu, p["rayon"])
+    if segment.type == "ravin":
+        return vitesse_ravin(g, masse, v_initial, l, L, h, Cx, Cz, frottements, p["longueur"])
+    return vitesse_piste(g, masse, acceleration, v_initial, l, L, h, Cx, frottements, rtol, atol, mu, p["longueur"])
+
+
+def simuler_lots(masse, acceleration, l, L, h, Cx, Cz, nos_pente=False, nos_looping=False, nos_piste=False,
+                 ailerons=False, frottements=False, mu=MU, rtol=RTOL, atol=ATOL, circuit=None):
+    """Simule le circuit complet pour chaque case des tableaux donnés.
+
+    Les caractéristiques et les options peuvent être des nombres ou des
+    tableaux de même forme (ou compatibles par broadcasting), y compris le
+    coefficient de frottement `mu` (utilisé seulement avec frottements). Les
+    segments sont ceux du circuit compilé `circuit` (circuits.charger() par
+    défaut). Renvoie un dictionnaire de tableaux aplatis : vitesse et chrono
+    de chaque segment, chrono total et résultat, comme Circuit.simuler.
+    """
+    circuit = circuits.charger() if circuit is None else circuit
+    g = G
+    masse, acceleration, l, L, h, Cx, Cz, mu, nos_pente, nos_looping, nos_piste, ailerons, frottements = (
+        np.ravel(x) for x in np.broadcast_arrays(masse, acceleration, l, L, h, Cx, Cz, mu, nos_pente, nos_looping,
+                                                  nos_piste, ailerons, frottements))
+    masse = np.trunc(masse.astype(float))
+    acceleration, l, L, h, Cx, Cz, mu = (x.astype(float) for x in (acceleration, l, L, h, Cx, Cz, mu))
+    nos_pente, nos_looping, nos_piste, ailerons, frottements = (
+        x.astype(bool) for x in (nos_pente, nos_looping, nos_piste, ailerons, frottements))
+
+    accelerations = {None: acceleration,
+                     "nos_pente": np.where(nos_pente, acceleration * BONUS_NOS, acceleration),
+                     "nos_looping": np.where(nos_looping, acceleration * BONUS_NOS, acceleration),
+                     "nos_piste": np.where(nos_piste, acceleration * BONUS_NOS, acceleration)}
+    Cz = np.where(ailerons, Cz * BONUS_CZ_AILERONS, Cz)
+    Cx = np.where(ailerons, Cx * BONUS_CX_AILERONS, Cx)
+    masse = np.where(ailerons, masse + MASSE_AILERONS, masse)
+
+    # Mêmes conditions que Circuit.etapes, appliquées à tout le lot
+    resultats = {}
+    v = np.zeros_like(masse)
+    temps_total = np.zeros_like(masse)
+    crash = np.zeros(masse.shape, dtype=bool)
+    marge = np.ones(masse.shape, dtype=bool)
+    for seg in circuit.segments:
+        if seg.vitesse_min is not None:
+            crash |= seg.vitesse_min > v
+            marge &= seg.vitesse_min < v
+        v, temps = _segment_lot(seg, g, masse, accelerations[seg.option_nos], v, l, L, h, Cx, Cz, frottements,
+                                rtol, atol, mu)
+        resultats["v_" + seg.nom], resultats["temps_" + seg.nom] = v, temps
+        temps_total = temps_total + temps
+    record = (temps_total < circuit.record) & marge
+    resultat = np.where(record, RESULTATS[0], np.where(crash, RESULTATS[2], RESULTATS[1]))
+
+    return {
+        **resultats,
+        "temps_total": temps_total,
+        "resultat": pd.Categorical(resultat, categories=RESULTATS, ordered=True),
+    }
+
+
+def caracteristiques_voitures(voitures):
+    """Caractéristiques lues par calculer_all, sous forme de tableaux indexés comme `voitures`."""
+    return {nom: voitures[colonne].to_numpy(dtype=float) for nom, colonne in COLONNES_VOITURE.items()}
+
+
+def simuler_flotte(voitures, configurations=None, rtol=RTOL, atol=ATOL):
+    """Simule chaque voiture avec chaque configuration sur tout le circuit.
+
+    `voitures` est le tableau lu depuis caracteristiques_voitures.csv et
+    `configurations` un DataFrame avec les colonnes de OPTIONS (toutes les
+    combinaisons par défaut). Renvoie une ligne par couple voiture/configuration
+    avec la vitesse et le chrono de chaque partie, comme calculer_all.
+    """
+    if configurations is None:
+        configurations = grille_configurations()
+    configurations = pd.DataFrame(configurations, columns=OPTIONS).astype(bool)
+
+    # Axe 0 : voitures, axe 1 : configurations
+    caracteristiques = {nom: valeurs[:, None] for nom, valeurs in caracteristiques_voitures(voitures).items()}
+    options = {option: configurations[option].to_numpy()[None, :] for option in OPTIONS}
+    resultats = simuler_lots(**caracteristiques, **options, rtol=rtol, atol=atol)
+
+    nb_configs = len(configurations)
+    return pd.DataFrame({
+        "Nom": np.repeat(voitures["Nom"].to_numpy(), nb_configs),
+        **{option: np.tile(configurations[option].to_numpy(), len(voitures)) for option in OPTIONS},
+        **resultats,
+    })
+
+
+def simuler_grille(voiture, axes, **options):
+    """Balayage des caractéristiques d'une voiture sur une grille.
+
+    `voiture` donne les caractéristiques de référence (clés de
+    COLONNES_VOITURE) et `axes` associe à une ou plusieurs de ces clés les
+    valeurs à parcourir. Toute la grille (produit cartésien des axes, en 2-D
+    ou 3-D) est simulée en un seul lot ; renvoie une ligne par point.
+    """
+    noms = list(axes)
+    grilles = np.meshgrid(*(np.asarray(axes[nom], dtype=float) for nom in noms), indexing="ij")
+    caracteristiques = {nom: voiture[nom] for nom in COLONNES_VOITURE}
+    caracteristiques.update(zip(noms, grilles))
+    resultats = simuler_lots(**caracteristiques, **options)
+    return pd.DataFrame({**{nom: grille.ravel() for nom, grille in zip(noms, grilles)}, **resultats})
+
+
+def classement(resultats):
+    """Trie les résultats : records battus d'abord, crashs en dernier, puis par chrono."""
+    return resultats.sort_values(["resultat", "temps_total"], ignore_index=True)
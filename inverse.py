@@ -0,0 +1,130 @@
+# Problèmes inverses : limites d'une voiture pour franchir le circuit et battre le record
+#
+# scipy est long à importer (environ 0,6 s) : l'application n'importe ce module
+# qu'au premier calcul des limites, et le préchauffage du serveur le charge avant.
+import math as mt
+
+from scipy.optimize import brentq
+
+import circuits
+from solveurs import V_MIN_RAVIN, appliquer_options, facteur_trainee, simuler_circuit
+
+XTOL = 1e-6         # Précision des valeurs cherchées
+BORNE_MAX = 1e3     # Au-delà, on considère qu'il n'y a pas de limite
+MARGE_MIN = -1e9    # Remplace les marges infinies (voiture arrêtée) pour la recherche de zéro
+
+
+def marge(resultat, circuit=None):
+    """Marge la plus faible parmi les conditions du record : positive si le record est battu.
+
+    Les conditions sont celles de Circuit.etapes : entrer dans chaque segment
+    plus vite que sa vitesse minimale, et finir avant le record du circuit.
+    Vaut 0 à la limite entre réussite et échec, ce qui permet de chercher
+    cette limite avec une méthode de recherche de zéro.
+    """
+    circuit = circuits.charger() if circuit is None else circuit
+    m = circuit.record - resultat["temps_total"]
+    v_entree = 0.0
+    for segment in circuit.segments:
+        if segment.vitesse_min is not None:
+            m = min(m, v_entree - segment.vitesse_min)
+        v_entree = resultat["v_" + segment.nom]
+    return max(m, MARGE_MIN)
+
+
+def chercher_limite(fonction, bas, haut):
+    """Zéro de `fonction` entre `bas` (négative) et `haut` (positive).
+
+    `haut` est doublé tant que la fonction ne change pas de signe ; renvoie
+    None si aucun changement de signe n'est trouvé avant BORNE_MAX.
+    """
+    f_haut = fonction(haut)
+    while f_haut <= 0:
+        if haut > BORNE_MAX:
+            return None
+        bas, haut = haut, 2 * haut
+        f_haut = fonction(haut)
+    return brentq(fonction, bas, haut, xtol=XTOL)
+
+
+def acceleration_min(masse, acceleration, l, L, h, Cx, Cz, **options):
+    """Accélération moyenne minimale pour battre le record avec ces options.
+
+    Renvoie 0 si la voiture bat le record sans accélérer, None si aucune
+    accélération raisonnable ne suffit.
+    """
+    def f(a):
+        return marge(simuler_circuit(masse, a, l, L, h, Cx, Cz, **options))
+
+    if f(0.0) > 0:
+        return 0.0
+    return chercher_limite(f, 0.0, max(acceleration, 1.0))
+
+
+def cx_max(masse, acceleration, l, L, h, Cx, Cz, **options):
+    """Cx maximal qui permet encore de battre le record avec ces options.
+
+    Renvoie None si le record est impossible même sans traînée, et l'infini si
+    le Cx n'a pas d'effet (sans frottements) ou jamais assez pour échouer.
+    """
+    def f(cx):
+        return -marge(simuler_circuit(masse, acceleration, l, L, h, cx, Cz, **options))
+
+    if f(0.0) >= 0:
+        return None
+    limite = chercher_limite(f, 0.0, max(Cx, 0.1))
+    return mt.inf if limite is None else limite
+
+
+def temps_depuis_arret(v, k_sur_m, longueur):
+    """Durée pour atteindre la vitesse `v` au bout de `longueur` en partant à l'arrêt.
+
+    L'accélération est supposée constante, freinée par une traînée
+    k_sur_m * v² comme dans la pente (integrer_segment) : v²(x) vaut
+    (a0 / k_sur_m)(1 - exp(-2 k_sur_m x)), ce qui donne a0, puis
+    x(t) = ln(cosh(t √(a0 k_sur_m))) / k_sur_m. Sans traînée, 2 * longueur / v.
+    """
+    if v <= 0:
+        return mt.inf
+    if k_sur_m <= 0:
+        return 2 * longueur / v
+    a0 = v * v * k_sur_m / -mt.expm1(-2 * k_sur_m * longueur)
+    return mt.acosh(mt.exp(k_sur_m * longueur)) / mt.sqrt(a0 * k_sur_m)
+
+
+def simuler_depuis_pente(v_pente, masse, acceleration, l, L, h, Cx, Cz, circuit=None, **options):
+    """Résultats de Circuit.simuler pour une voiture qui sort du premier segment (la pente) à `v_pente`.
+
+    Les segments suivants sont parcourus par le circuit compilé à partir de
+    cet état. Le chrono de la pente est une approximation : celui d'une
+    voiture partie à l'arrêt avec une accélération constante qui atteint
+    `v_pente` en bas, freinée par la traînée si les frottements sont
+    activés (voir temps_depuis_arret).
+    """
+    circuit = circuits.charger() if circuit is None else circuit
+    pente = circuit.segments[0]
+    masse_totale, _, _, _, cx, _ = appliquer_options(masse, acceleration, Cx, Cz,
+                                                     ailerons=options.get("ailerons", False))
+    k_sur_m = facteur_trainee(L, h) * cx / masse_totale if options.get("frottements") else 0.0
+    temps_pente = temps_depuis_arret(v_pente, k_sur_m, pente.longueur)
+    resultats = {"v_" + pente.nom: v_pente, "temps_" + pente.nom: temps_pente}
+    resultats.update(circuit.simuler(masse, acceleration, l, L, h, Cx, Cz, **options, debut=1,
+                                     etat=circuits.Etat(v_pente, temps_pente, pente.longueur)))
+    return resultats
+
+
+def vitesse_min_looping(masse, acceleration, l, L, h, Cx, Cz, **options):
+    """Vitesse minimale en bas de la pente pour battre le record avec ces options.
+
+    Comme acceleration_min et cx_max, la limite est celle de marge : la
+    voiture doit franchir le looping, puis le ravin, et finir avant le
+    record, avec le chrono de pente approché de simuler_depuis_pente.
+    Renvoie None si aucune vitesse raisonnable ne suffit.
+    """
+    circuit = circuits.charger()
+
+    def f(v):
+        return marge(simuler_depuis_pente(v, masse, acceleration, l, L, h, Cx, Cz, circuit, **options), circuit)
+
+    vitesse_max = max((s.vitesse_min for s in circuit.segments if s.vitesse_min is not None), default=V_MIN_RAVIN)
+    return chercher_limite(f, 0.0, 2 * vitesse_max)
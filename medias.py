@@ -0,0 +1,128 @@
+# Images de l'application : préparées une fois (taille affichée, format compact), servies depuis la mémoire
+#
+# Exemple :
+#   python medias.py                                  # prépare toutes les images dans medias/
+#   python medias.py --source record_rate=mario.gif   # utilise un fichier local au lieu de l'URL
+import argparse
+import functools
+import io
+import os
+import urllib.request
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_MEDIAS = os.path.join(DOSSIER, "medias")
+LARGEUR_PAGE = 704  # Largeur de la colonne centrale de Streamlit (en pixels)
+
+# Nom : (fichier ou URL d'origine, largeur affichée en pixels)
+MEDIAS = {
+    "circuit": ("circuit.png", LARGEUR_PAGE),
+    "pente": ("Pente.png", 650),
+    "looping": ("Looping.png", 660),
+    "ravin": ("Ravin.png", 650),
+    "piste": ("Piste.png", 650),
+    "record_battu": ("https://forums.pixeltailgames.com/uploads/default/original/3X/d/1/"
+                     "d12d0941862841dad6ffe2281b25aeb8d971f3b0.gif", 650),
+    "crash": ("https://pa1.aminoapps.com/6825/e33c02e435883599bace42ae25b1e1bbf4cacdb5_hq.gif", 650),
+    "crash_2": ("https://i.gifer.com/SqwX.gif", 650),
+    "record_rate": ("https://media1.tenor.com/m/fVtFN_1f1HkAAAAC/mario-kart.gif", 650),
+}
+
+
+def chemin(nom):
+    """Fichier préparé de l'image `nom`."""
+    return os.path.join(DOSSIER_MEDIAS, nom + ".webp")
+
+
+def _distant(source):
+    return source.startswith(("http://", "https://"))
+
+
+@functools.lru_cache(maxsize=None)
+def lire(nom):
+    """Octets de l'image préparée `nom`, à passer à st.image, lus sur le disque une seule fois par processus.
+
+    Lève FileNotFoundError si l'image n'est pas dans DOSSIER_MEDIAS : rien
+    n'est mis en cache, le fichier sera lu dès qu'il aura été préparé.
+    """
+    if nom not in MEDIAS:
+        raise KeyError(f"Image inconnue : {nom!r}")
+    if not os.path.exists(chemin(nom)):
+        raise FileNotFoundError(f"L'image {nom} n'est pas préparée dans {DOSSIER_MEDIAS} (python medias.py {nom})")
+    with open(chemin(nom), "rb") as fichier:
+        return fichier.read()
+
+
+def image(nom):
+    """Image `nom` à passer à st.image : les octets préparés, sinon l'URL d'origine d'un GIF distant.
+
+    Seuls les GIF distants ont ce repli, le temps que `python medias.py`
+    les prépare ; un schéma local manquant lève FileNotFoundError comme lire.
+    """
+    try:
+        return lire(nom)
+    except FileNotFoundError:
+        if _distant(MEDIAS[nom][0]):
+            return MEDIAS[nom][0]
+        raise
+
+
+def preparees():
+    """Noms des images déjà préparées dans DOSSIER_MEDIAS."""
+    return [nom for nom in MEDIAS if os.path.exists(chemin(nom))]
+
+
+def preparer(nom, source=None):
+    """Réduit l'image `nom` à sa largeur affichée et l'enregistre en WebP dans DOSSIER_MEDIAS.
+
+    Les schémas sont enregistrés sans perte ; les GIF animés gardent leur
+    animation. Renvoie (taille d'origine, taille préparée) en octets.
+    """
+    from PIL import Image, ImageSequence
+
+    origine, largeur = MEDIAS[nom]
+    source = source or origine
+    if _distant(source):
+        requete = urllib.request.Request(source, headers={"User-Agent": "Mozilla/5.0"})
+        with urllib.request.urlopen(requete, timeout=30) as reponse:
+            donnees = reponse.read()
+    else:
+        with open(os.path.join(DOSSIER, source), "rb") as fichier:
+            donnees = fichier.read()
+
+    with Image.open(io.BytesIO(donnees)) as image:
+        # Jamais agrandie : le navigateur le fait aussi bien, sans octets en plus
+        echelle = min(1.0, largeur / image.width)
+        taille = (round(image.width * echelle), round(image.height * echelle))
+        images = [im.convert("RGBA").resize(taille, Image.LANCZOS) for im in ImageSequence.Iterator(image)]
+        os.makedirs(DOSSIER_MEDIAS, exist_ok=True)
+        if len(images) > 1:
+            durees = [im.info.get("duration", 100) for im in ImageSequence.Iterator(image)]
+            images[0].save(chemin(nom), save_all=True, append_images=images[1:], duration=durees,
+                           loop=image.info.get("loop", 0), quality=80, method=6)
+        else:
+            images[0].save(chemin(nom), lossless=True, method=6)
+    return len(donnees), os.path.getsize(chemin(nom))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Prépare les images de l'application dans medias/.")
+    parser.add_argument("noms", nargs="*", default=list(MEDIAS), help="images à préparer (toutes par défaut)")
+    parser.add_argument("--source", action="append", default=[], metavar="NOM=FICHIER",
+                        help="fichier local à utiliser à la place de l'origine d'une image")
+    args = parser.parse_args(arguments)
+    sources = dict(s.split("=", 1) for s in args.source)
+
+    echecs = 0
+    for nom in args.noms:
+        try:
+            avant, apres = preparer(nom, sources.get(nom))
+        except OSError as erreur:
+            print(f"{nom:<14} échec : {erreur}")
+            echecs += 1
+            continue
+        print(f"{nom:<14} {avant / 1024:8.1f} Ko -> {apres / 1024:8.1f} Ko")
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
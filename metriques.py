@@ -0,0 +1,206 @@
+# Mesures de performance de chaque segment : journal structuré, percentiles et export Prometheus
+#
+# Chaque segment calculé donne une Mesure (durée, évaluations de l'intégrateur,
+# points de trajectoire, statut du cache), écrite dans le journal et ajoutée au
+# registre du processus. Les tours calculés dans le pool (voir calculs) renvoient
+# leurs mesures avec le résultat.
+#
+# Exemple :
+#   METRIQUES_FICHIER=metriques.prom streamlit run Hello.py   # fichier relu par node_exporter
+#   METRIQUES_PORT=9464 streamlit run Hello.py                 # http://localhost:9464/metrics
+#   METRIQUES_HOTE=0.0.0.0 METRIQUES_PORT=9464 streamlit run Hello.py   # accessible depuis les autres machines
+import collections
+import contextlib
+import http.server
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+FICHIER = os.environ.get("METRIQUES_FICHIER")
+PORT = int(os.environ.get("METRIQUES_PORT", 0))
+HOTE = os.environ.get("METRIQUES_HOTE", "127.0.0.1")  # Adresse d'écoute ; locale seulement par défaut
+ADMIN = os.environ.get("METRIQUES_ADMIN", "0") != "0"  # Panneau des percentiles dans la barre latérale
+FENETRE = 1000  # Dernières mesures gardées par segment pour les percentiles
+QUANTILES = [0.5, 0.9, 0.99]
+
+Mesure = collections.namedtuple("Mesure", ["segment", "type", "operation", "voiture", "duree", "evaluations",
+                                           "points", "cache"])
+
+_local = threading.local()
+
+
+def compter_evaluations(n):
+    """Appelé par l'intégrateur : ajoute `n` évaluations à la mesure en cours dans ce thread."""
+    _local.evaluations = getattr(_local, "evaluations", 0) + n
+
+
+def noter_cache(trouve):
+    """Appelé par le cache : le résultat de la mesure en cours vient du cache (ou non)."""
+    _local.cache = "hit" if trouve else "miss"
+
+
+@contextlib.contextmanager
+def mesurer(segment, type_segment, voiture, operation="tour"):
+    """Mesure le calcul d'un segment ; le bloc peut renseigner details["points"]."""
+    _local.evaluations = 0
+    _local.cache = "sans"
+    details = {"points": 0}
+    debut = time.perf_counter()
+    try:
+        yield details
+    finally:
+        # Un segment qui lève une exception est mesuré aussi, et les compteurs du thread remis à zéro
+        enregistrer(Mesure(segment, type_segment, operation, voiture, time.perf_counter() - debut,
+                           _local.evaluations, details["points"], _local.cache))
+        _local.evaluations = 0
+        _local.cache = "sans"
+
+
+def enregistrer(mesure):
+    collecte = getattr(_local, "collecte", None)
+    if collecte is not None:
+        collecte.append(mesure)
+    else:
+        REGISTRE.enregistrer(mesure)
+
+
+@contextlib.contextmanager
+def collecter():
+    """Garde les mesures du bloc dans une liste au lieu du registre (dans les processus du pool)."""
+    _local.collecte = []
+    try:
+        yield _local.collecte
+    finally:
+        _local.collecte = None
+
+
+def _etiquette(valeur):
+    # Échappements imposés par le format texte de Prometheus dans les valeurs d'étiquette
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _quantile(valeurs, q):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(q * len(valeurs)))]
+
+
+class Registre:
+    """Mesures du processus : compteurs cumulés et fenêtre glissante des durées par segment."""
+
+    def __init__(self, fenetre=FENETRE):
+        self._verrou = threading.Lock()
+        self._durees = collections.defaultdict(lambda: collections.deque(maxlen=fenetre))
+        self._totaux = collections.defaultdict(lambda: {"count": 0, "sum": 0.0, "evaluations": 0, "points": 0})
+        self._cache = collections.Counter()
+
+    def enregistrer(self, *mesures):
+        with self._verrou:
+            for mesure in mesures:
+                cle = (mesure.segment, mesure.operation)
+                self._durees[cle].append(mesure.duree)
+                totaux = self._totaux[cle]
+                totaux["count"] += 1
+                totaux["sum"] += mesure.duree
+                totaux["evaluations"] += mesure.evaluations
+                totaux["points"] += mesure.points
+                self._cache[(mesure.segment, mesure.operation, mesure.cache)] += 1
+        for mesure in mesures:
+            LOGGER.info("segment=%s operation=%s voiture=%r duree_ms=%.3f evaluations=%d points=%d cache=%s",
+                        mesure.segment, mesure.operation, mesure.voiture, 1e3 * mesure.duree, mesure.evaluations,
+                        mesure.points, mesure.cache, extra={"mesure": mesure._asdict()})
+
+    def instantane(self):
+        """Une ligne par (segment, opération) : nombre de calculs, percentiles de durée (en ms), totaux."""
+        with self._verrou:
+            lignes = []
+            for (segment, operation), durees in sorted(self._durees.items()):
+                totaux = self._totaux[(segment, operation)]
+                lignes.append({
+                    "segment": segment, "operation": operation, "calculs": totaux["count"],
+                    **{f"p{round(100 * q)} (ms)": 1e3 * _quantile(durees, q) for q in QUANTILES},
+                    "évaluations": totaux["evaluations"], "points": totaux["points"],
+                    "cache hits": self._cache[(segment, operation, "hit")],
+                    "cache misses": self._cache[(segment, operation, "miss")],
+                })
+            return lignes
+
+    def prometheus(self):
+        """Mesures au format texte de Prometheus."""
+        lignes = ["# HELP circuit_segment_duree_secondes Durée de calcul d'un segment",
+                  "# TYPE circuit_segment_duree_secondes summary"]
+        with self._verrou:
+            for (segment, operation), durees in sorted(self._durees.items()):
+                etiquettes = f'segment="{_etiquette(segment)}",operation="{operation}"'
+                for q in QUANTILES:
+                    lignes.append(f'circuit_segment_duree_secondes{{{etiquettes},quantile="{q}"}} '
+                                  f'{_quantile(durees, q):.9g}')
+                lignes.append(f"circuit_segment_duree_secondes_sum{{{etiquettes}}} "
+                              f"{self._totaux[(segment, operation)]['sum']:.9g}")
+                lignes.append(f"circuit_segment_duree_secondes_count{{{etiquettes}}} "
+                              f"{self._totaux[(segment, operation)]['count']}")
+            for nom, cle, aide in [("evaluations", "evaluations", "Évaluations de l'intégrateur"),
+                                   ("points", "points", "Points de trajectoire produits")]:
+                lignes += [f"# HELP circuit_segment_{nom}_total {aide}", f"# TYPE circuit_segment_{nom}_total counter"]
+                for (segment, operation), totaux in sorted(self._totaux.items()):
+                    etiquettes = f'segment="{_etiquette(segment)}",operation="{operation}"'
+                    lignes.append(f"circuit_segment_{nom}_total{{{etiquettes}}} {totaux[cle]}")
+            lignes += ["# HELP circuit_cache_total Résultats de segment lus dans le cache ou recalculés",
+                       "# TYPE circuit_cache_total counter"]
+            for (segment, operation, statut), nombre in sorted(self._cache.items()):
+                etiquettes = f'segment="{_etiquette(segment)}",operation="{operation}",statut="{statut}"'
+                lignes.append(f"circuit_cache_total{{{etiquettes}}} {nombre}")
+        return "\n".join(lignes) + "\n"
+
+    def ecrire(self, chemin):
+        # Fichier remplacé d'un coup : un lecteur ne voit jamais un export à moitié écrit
+        temporaire = f"{chemin}.{os.getpid()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            fichier.write(self.prometheus())
+        os.replace(temporaire, chemin)
+
+
+REGISTRE = Registre()
+
+
+class _Export(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corps = REGISTRE.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def exporter(chemin=FICHIER, intervalle=15):
+    """Réécrit REGISTRE dans le fichier `chemin` toutes les `intervalle` secondes, dans un thread du serveur."""
+    def boucle():
+        while True:
+            try:
+                REGISTRE.ecrire(chemin)
+            except OSError as erreur:
+                LOGGER.warning("Impossible d'écrire les métriques dans %s (%s)", chemin, erreur)
+            time.sleep(intervalle)
+
+    threading.Thread(target=boucle, daemon=True).start()
+
+
+def servir(port=PORT, hote=HOTE):
+    """Expose REGISTRE sur http://<hote>:<port>/metrics dans un thread du serveur.
+
+    Par défaut l'adresse d'écoute est 127.0.0.1 : seul un collecteur sur la
+    même machine y a accès, sauf avec METRIQUES_HOTE=0.0.0.0 (ou `hote`).
+    """
+    serveur = http.server.ThreadingHTTPServer((hote, port), _Export)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    LOGGER.info("Métriques exposées sur %s:%d", *serveur.server_address[:2])
+    return serveur
@@ -0,0 +1,118 @@
+# Incertitude sur le chrono : simulation de Monte-Carlo autour des caractéristiques estimées
+import numpy as np
+import pandas as pd
+
+import circuits
+from flotte import caracteristiques_voitures, simuler_lots
+from solveurs import MU
+
+TIRAGES = 100_000
+# Une tolérance plus lâche suffit : l'erreur d'intégration (~1e-6 s) est très
+# petite devant la dispersion due aux paramètres tirés au hasard
+RTOL = ATOL = 1e-6
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Loi de chaque paramètre incertain : (« normale », écart-type relatif)
+# ou (« uniforme », demi-largeur relative) autour de la valeur de la voiture
+DISTRIBUTIONS = {
+    "acceleration": ("normale", 0.05),
+    "Cx": ("normale", 0.05),
+    "Cz": ("normale", 0.05),
+    "mu": ("uniforme", 0.2),
+}
+LOIS = ["normale", "uniforme"]
+
+
+def tirer(valeurs, distributions=None, n=TIRAGES, graine=None):
+    """Tire `n` jeux de paramètres autour de `valeurs` selon `distributions`.
+
+    Les paramètres absents de `distributions` gardent leur valeur ; les
+    tirages négatifs sont ramenés à 0 (une traînée ou une accélération
+    négative n'a pas de sens).
+    """
+    distributions = DISTRIBUTIONS if distributions is None else distributions
+    generateur = np.random.default_rng(graine)
+    tirages = {}
+    for nom, (loi, ecart) in distributions.items():
+        centre = valeurs[nom]
+        if loi == "normale":
+            x = centre * (1 + ecart * generateur.standard_normal(n))
+        elif loi == "uniforme":
+            x = centre * (1 + ecart * generateur.uniform(-1, 1, n))
+        else:
+            raise ValueError(f"Loi inconnue pour {nom} : {loi} (attendu : {', '.join(LOIS)})")
+        tirages[nom] = np.maximum(x, 0.0)
+    return tirages
+
+
+def echecs(resultats, circuit=None):
+    """Type de segment où chaque tour du lot échoue (proba_echec_<type>), None s'il n'y a pas de crash.
+
+    Le crash est attribué au premier segment à vitesse minimale où la voiture
+    entre trop lentement ou cale ; une voiture trop lente en bas de la pente
+    ou qui cale dans le looping est donc un échec du looping.
+    """
+    circuit = circuits.charger() if circuit is None else circuit
+    crashs = np.asarray(resultats["resultat"]) == "CRASH"
+    echec = np.full(crashs.shape, None, dtype=object)
+    restants = crashs.copy()
+    v_entree = np.zeros(crashs.shape)
+    for segment in circuit.segments:
+        v_sortie = resultats["v_" + segment.nom]
+        if segment.vitesse_min is not None:
+            ici = restants & ((segment.vitesse_min > v_entree) | (v_sortie <= 0))
+            echec[ici] = segment.type
+            restants &= ~ici
+        v_entree = v_sortie
+    return echec
+
+
+def resumer(resultats, circuit=None):
+    """Percentiles du chrono et probabilités de crash et de record d'un lot de simulations.
+
+    Les percentiles ne portent que sur les tours terminés sans crash, au
+    sens de Circuit.simuler. Chaque crash est compté comme un échec du type
+    de segment où il a lieu (voir echecs) : proba_echec_looping,
+    proba_echec_ravin pour le circuit du livrable.
+    """
+    circuit = circuits.charger() if circuit is None else circuit
+    crashs = np.asarray(resultats["resultat"]) == "CRASH"
+    echec = echecs(resultats, circuit)
+    types = dict.fromkeys(segment.type for segment in circuit.segments if segment.vitesse_min is not None)
+    termines = resultats["temps_total"][~crashs]
+    if termines.size:
+        percentiles = np.percentile(termines, PERCENTILES)
+    else:
+        percentiles = np.full(len(PERCENTILES), np.nan)
+    return {
+        "tirages": resultats["temps_total"].size,
+        **{f"p{p}": valeur for p, valeur in zip(PERCENTILES, percentiles)},
+        **{f"proba_echec_{type_segment}": (echec == type_segment).mean() for type_segment in types},
+        "proba_record": (np.asarray(resultats["resultat"]) == "RECORD BATTU").mean(),
+    }
+
+
+def analyser(voiture, n=TIRAGES, distributions=None, graine=None, rtol=RTOL, atol=ATOL, **options):
+    """Simule `n` variantes d'une voiture sur tout le circuit, en un seul lot vectorisé.
+
+    `voiture` donne les caractéristiques de référence (clés de
+    COLONNES_VOITURE, plus `mu`, MU par défaut). Renvoie (résumé, résultats)
+    où les résultats contiennent aussi les paramètres tirés.
+    """
+    valeurs = {"mu": MU, **voiture}
+    tirages = tirer(valeurs, distributions, n, graine)
+    resultats = simuler_lots(**{**valeurs, **tirages}, **options, rtol=rtol, atol=atol)
+    return resumer(resultats), {**tirages, **resultats}
+
+
+def analyser_flotte(voitures, n=TIRAGES, distributions=None, graine=None, **options):
+    """Résumé de Monte-Carlo pour chaque voiture du tableau lu depuis le CSV, une ligne par voiture."""
+    tableaux = caracteristiques_voitures(voitures)
+    mu = voitures["µ"].to_numpy(dtype=float) if "µ" in voitures else np.full(len(voitures), MU)
+    generateur = np.random.default_rng(graine)
+    lignes = []
+    for i, nom in enumerate(voitures["Nom"]):
+        voiture = {p: float(valeurs[i]) for p, valeurs in tableaux.items()}
+        resume, _ = analyser({**voiture, "mu": mu[i]}, n, distributions, generateur, **options)
+        lignes.append({"Nom": nom, **resume})
+    return pd.DataFrame(lignes)
@@ -0,0 +1,97 @@
+# Boucles d'Euler à pas fixe, interprétées ou compilées avec Numba
+#
+# Le même code source sert aux deux versions : les résultats sont identiques
+# bit à bit, seule la vitesse change. Numba est optionnel (pip install numba).
+import functools
+import logging
+import math as mt
+import os
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+NOYAUX = ["python", "numba"]
+# Noyau utilisé par défaut ; "python" si Numba n'est pas installé
+NOYAU = os.environ.get("NOYAU_CALCUL", "numba")
+
+
+def euler_segment(a, acceleration, b, k, masse, v_initial, distance, dt):
+    """Intègre dv/dt = a + acceleration - k v² / masse - b par pas de `dt` jusqu'à `distance`.
+
+    Renvoie (0, inf) si la voiture s'arrête avant la fin du segment.
+    """
+    v = v_initial
+    t = 0.0
+    OM = 0.0
+    while OM < distance:
+        v += (a + acceleration - ((k * v**2) / masse) - b) * dt
+        OM += v * dt
+        t += dt
+        if v <= 0:
+            return 0.0, mt.inf
+    return v, t
+
+
+def euler_ravin(v_initial, g, masse, kx, ky, y_initial, distance, dt, xs, ys):
+    """Saut de `distance` au-dessus du ravin avec traînée, par pas de `dt`.
+
+    Si `xs` et `ys` ne sont pas vides, les positions successives y sont
+    écrites tant qu'il reste de la place. Renvoie (vitesse horizontale,
+    temps, nombre de pas).
+    """
+    temps = 0.0
+    v_x = v_initial
+    v_y = 0.0
+    x = 0.0
+    y = y_initial
+    ay = -g
+    n = 0
+    while x < distance:
+        v_x -= (kx / masse) * (v_x**2) * dt
+        v_y += (ay - (ky / masse) * (v_y**2)) * dt
+        x += v_x * dt
+        y += v_y * dt
+        if n < xs.size:
+            xs[n] = x
+            ys[n] = y
+        n += 1
+        temps += dt
+    return v_x, temps, n
+
+
+_PYTHON = {"segment": euler_segment, "ravin": euler_ravin}
+
+
+@functools.lru_cache(maxsize=None)
+def _compiles():
+    try:
+        import numba
+    except ImportError:
+        LOGGER.warning("Numba n'est pas installé, utilisation du noyau python")
+        return _PYTHON
+    # cache=True garde le code machine sur disque : la compilation n'est payée qu'au premier lancement
+    return {nom: numba.njit(cache=True)(fonction) for nom, fonction in _PYTHON.items()}
+
+
+def noyau(nom=None):
+    """Fonctions du noyau `nom` ("python" ou "numba", NOYAU par défaut)."""
+    nom = nom or NOYAU
+    if nom not in NOYAUX:
+        raise ValueError(f"Noyau inconnu : {nom} (attendu : {', '.join(NOYAUX)})")
+    return _compiles() if nom == "numba" else _PYTHON
+
+
+def choisir(nom):
+    """Change le noyau utilisé par défaut par les solveurs d'Euler."""
+    global NOYAU
+    noyau(nom)
+    NOYAU = nom
+
+
+def prechauffer(nom=None):
+    """Compile le noyau et l'exécute une fois, pour que le premier calcul soit rapide."""
+    fonctions = noyau(nom)
+    vide = np.empty(0)
+    fonctions["segment"](1.0, 1.0, 0.1, 0.5, 1000.0, 0.0, 1.0, 0.01)
+    fonctions["ravin"](30.0, 9.81, 1000.0, 0.5, 0.5, 1.0, 9.0, 0.01, vide, vide)
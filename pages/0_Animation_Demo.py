@@ -12,13 +12,169 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable
 
 import numpy as np
+from PIL import Image
 
 import streamlit as st
 from streamlit.hello.utils import show_code
 
+WIDTH, HEIGHT, SCALE = 960, 640, 400
+FRAMES = 100
+# Encoded frames kept for all sessions; least recently used ones are evicted past this size
+FRAME_CACHE_BYTES = int(os.environ.get("ANIMATION_CACHE_BYTES", 64 * 1024 * 1024))
+# Each worker owns a kernel whose buffers take about 40 MB at 960x640, so their number is capped
+RENDER_WORKERS = int(os.environ.get("ANIMATION_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class JuliaKernel:
+    """Escape-time kernel for the Julia set, with all buffers allocated once.
+
+    Each frame starts from the same grid, updates the still-bounded points in
+    place and compacts them as points escape, so later iterations only touch
+    the pixels that are still active.
+    """
+
+    def __init__(self, width: int, height: int, scale: float, dtype: type = np.complex64) -> None:
+        self.shape = (height, width)
+        self.dtype = np.dtype(dtype)
+        real = np.dtype(self.dtype.char.lower())  # complex64 -> float32
+        x = np.linspace(-width / scale, width / scale, num=width, dtype=real)
+        y = np.linspace(-height / scale, height / scale, num=height, dtype=real)
+        size = width * height
+        self.grid = np.empty(self.shape, dtype=self.dtype)
+        self.grid.real = x[np.newaxis, :]
+        self.grid.imag = y[:, np.newaxis]
+        self.grid = self.grid.ravel()
+        self.indices = np.arange(size, dtype=np.intp)
+        # Two buffers for the active points and their pixel indices, swapped at each compaction
+        self.z = [np.empty(size, dtype=self.dtype), np.empty(size, dtype=self.dtype)]
+        self.active = [np.empty(size, dtype=np.intp), np.empty(size, dtype=np.intp)]
+        self.modulus = np.empty(size, dtype=real)
+        self.square = np.empty(size, dtype=real)
+        self.escaped = np.empty(size, dtype=bool)
+        self.kept = np.empty(size, dtype=bool)
+        self.counts = np.empty(size, dtype=real)
+        self.pixels = np.empty(self.shape, dtype=real)
+
+    def frame(self, c: complex, iterations: int) -> np.ndarray:
+        """Grey levels of the frame for z -> z² + c; the returned array is reused by the next frame."""
+        z, active = self.z[0], self.active[0]
+        z[:] = self.grid
+        active[:] = self.indices
+        counts = self.counts
+        counts.fill(0)
+        c = self.dtype.type(c)
+        count = z.size
+        for i in range(iterations):
+            zk = z[:count]
+            np.multiply(zk, zk, out=zk)
+            zk += c
+            modulus, square = self.modulus[:count], self.square[:count]
+            np.multiply(zk.real, zk.real, out=modulus)
+            np.multiply(zk.imag, zk.imag, out=square)
+            modulus += square
+            escaped = np.greater(modulus, 4, out=self.escaped[:count])
+            # A point keeps the last iteration at which it was still bounded
+            counts[active[:count][escaped]] = max(i - 1, 0)
+            kept = np.logical_not(escaped, out=self.kept[:count])
+            remaining = int(np.count_nonzero(kept))
+            if remaining < count:
+                z_next, active_next = self.z[1], self.active[1]
+                np.compress(kept, zk, out=z_next[:remaining])
+                np.compress(kept, active[:count], out=active_next[:remaining])
+                self.z.reverse()
+                self.active.reverse()
+                z, active, count = z_next, active_next, remaining
+            if count == 0:
+                break
+        if iterations > 0:
+            counts[active[:count]] = iterations - 1
+        pixels = self.pixels.reshape(-1)
+        np.divide(counts, counts.max() or 1, out=pixels)
+        np.subtract(1.0, pixels, out=pixels)
+        return self.pixels
+
+
+class FrameCache:
+    """Bounded LRU cache of encoded frames, shared by every session of the server.
+
+    A frame that is already being computed is not submitted twice: callers
+    get the same future.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._frames: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._pending: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, executor: ThreadPoolExecutor, compute: Callable[[], bytes]) -> Future:
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                future: Future = Future()
+                future.set_result(self._frames[key])
+                return future
+            if key in self._pending:
+                return self._pending[key]
+            future = executor.submit(compute)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def _store(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            del self._pending[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            data = future.result()
+            self._frames[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and self._frames:
+                _, evicted = self._frames.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class FrameRenderer:
+    """Worker pool rendering frames in parallel; NumPy releases the GIL in the kernel's array operations."""
+
+    def __init__(self, workers: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="julia")
+        self.cache = FrameCache(FRAME_CACHE_BYTES)
+        self._local = threading.local()
+
+    def _render(self, c: complex, iterations: int) -> bytes:
+        # Each worker thread keeps its own kernel, whose buffers are reused from frame to frame
+        kernel = getattr(self._local, "kernel", None)
+        if kernel is None:
+            kernel = self._local.kernel = JuliaKernel(WIDTH, HEIGHT, SCALE, np.complex64)
+        pixels = kernel.frame(c, iterations)
+        buffer = io.BytesIO()
+        Image.fromarray((pixels * 255).astype(np.uint8), mode="L").save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+    def frames(self, iterations: int, separation: float) -> list:
+        """Futures of the encoded frames for these settings, in order; cached frames are already done."""
+        separation = round(separation, 6)
+        return [
+            self.cache.get((iterations, separation, frame_num), self.executor,
+                           lambda c=separation * np.exp(1j * a): self._render(c, iterations))
+            for frame_num, a in enumerate(np.linspace(0.0, 4 * np.pi, FRAMES))
+        ]
+
+
+@st.cache_resource
+def frame_renderer() -> FrameRenderer:
+    return FrameRenderer(RENDER_WORKERS)
+
 
 def animation_demo() -> None:
 
@@ -36,29 +192,17 @@ def animation_demo() -> None:
     frame_text = st.sidebar.empty()
     image = st.empty()
 
-    m, n, s = 960, 640, 400
-    x = np.linspace(-m / s, m / s, num=m).reshape((1, m))
-    y = np.linspace(-n / s, n / s, num=n).reshape((n, 1))
+    # Performing some fractal wizardry: all frames are rendered in parallel, and
+    # frames already rendered with these settings come straight from the cache.
+    frames = frame_renderer().frames(iterations, separation)
 
-    for frame_num, a in enumerate(np.linspace(0.0, 4 * np.pi, 100)):
+    for frame_num, frame in enumerate(frames):
         # Here were setting value for these two elements.
         progress_bar.progress(frame_num)
         frame_text.text("Frame %i/100" % (frame_num + 1))
 
-        # Performing some fractal wizardry.
-        c = separation * np.exp(1j * a)
-        Z = np.tile(x, (n, 1)) + 1j * np.tile(y, (1, m))
-        C = np.full((n, m), c)
-        M: Any = np.full((n, m), True, dtype=bool)
-        N = np.zeros((n, m))
-
-        for i in range(iterations):
-            Z[M] = Z[M] * Z[M] + C[M]
-            M[np.abs(Z) > 2] = False
-            N[M] = i
-
         # Update the image placeholder by calling the image() function on it.
-        image.image(1.0 - (N / N.max()), use_column_width=True)
+        image.image(frame.result(), width="stretch")
 
     # We clear elements by calling empty on them.
     progress_bar.empty()
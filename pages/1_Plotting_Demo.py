@@ -15,23 +15,78 @@
 import time
 
 import numpy as np
+import pandas as pd
 
 import streamlit as st
 from streamlit.hello.utils import show_code
 
 
+class RingBuffer:
+    """Fixed-size buffer of the most recent rows, with their position in the whole stream."""
+
+    def __init__(self, capacity: int, columns: int) -> None:
+        self.values = np.empty((capacity, columns))
+        self.positions = np.empty(capacity, dtype=np.int64)
+        self.total = 0  # Rows appended since the start, including those overwritten
+
+    def extend(self, rows: np.ndarray) -> None:
+        # Rows that would be overwritten within this same batch are skipped
+        skipped = max(0, len(rows) - len(self.values))
+        positions = self.total + skipped + np.arange(len(rows) - skipped)
+        slots = positions % len(self.values)
+        self.values[slots] = rows[skipped:]
+        self.positions[slots] = positions
+        self.total += len(rows)
+
+    def window(self) -> pd.DataFrame:
+        """The buffered rows in stream order, with their position in the stream in the "sample" column."""
+        count = min(self.total, len(self.values))
+        order = (self.total - count + np.arange(count)) % len(self.values)
+        window = pd.DataFrame(self.values[order], columns=[f"value_{j}" for j in range(self.values.shape[1])])
+        window.insert(0, "sample", self.positions[order])
+        return window
+
+
+# A fixed Vega-Lite spec, redrawn once per batch of rows instead of once per row:
+# fewer messages are sent, but each one still carries the whole window (up to
+# 2000 rows, see the "Points shown" slider), not just the new rows
+CHART_SPEC = {
+    "mark": {"type": "line"},
+    "encoding": {
+        "x": {"field": "sample", "type": "quantitative", "scale": {"zero": False}},
+        "y": {"field": "value_0", "type": "quantitative"},
+    },
+}
+
+
 def plotting_demo():
+    # Rows are generated every tick but only sent to the browser in batches,
+    # and the chart only ever holds the last `window` points.
+    window = st.sidebar.slider("Points shown", 50, 2000, 200, 50)
+    flush_interval = st.sidebar.slider("Flush interval (s)", 0.05, 2.0, 0.25, 0.05)
+    batch_size = st.sidebar.slider("Batch size (rows)", 5, 500, 50, 5)
+
     progress_bar = st.sidebar.progress(0)
     status_text = st.sidebar.empty()
     last_rows = np.random.randn(1, 1)
-    chart = st.line_chart(last_rows)
+    buffer = RingBuffer(window, 1)
+    buffer.extend(last_rows)
+    chart = st.empty()
+    chart.vega_lite_chart(buffer.window(), CHART_SPEC, width="stretch")
 
+    pending = 0
+    last_flush = time.monotonic()
     for i in range(1, 101):
         new_rows = last_rows[-1, :] + np.random.randn(5, 1).cumsum(axis=0)
-        status_text.text("%i%% Complete" % i)
-        chart.add_rows(new_rows)
-        progress_bar.progress(i)
+        buffer.extend(new_rows)
+        pending += len(new_rows)
         last_rows = new_rows
+        if pending >= batch_size or time.monotonic() - last_flush >= flush_interval or i == 100:
+            status_text.text("%i%% Complete" % i)
+            chart.vega_lite_chart(buffer.window(), CHART_SPEC, width="stretch")
+            progress_bar.progress(i)
+            pending = 0
+            last_flush = time.monotonic()
         time.sleep(0.05)
 
     progress_bar.empty()
@@ -0,0 +1,93 @@
+# Balayage des caractéristiques d'une voiture sur tout le circuit
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from catalogue import COLONNES_VOITURE as PARAMETRES, charger as charger_catalogue
+from flotte import OPTIONS, caracteristiques_voitures, simuler_grille, simuler_lots
+
+NOMS_OPTIONS = {
+    "nos_pente": "NOS dans la pente",
+    "nos_looping": "NOS dans le looping",
+    "nos_piste": "NOS sur la piste",
+    "ailerons": "Système de planage",
+    "frottements": "Avec frottements",
+}
+COULEURS_RESULTAT = alt.Scale(domain=["RECORD BATTU", "RECORD RATÉ", "CRASH"], range=["#2ca02c", "#ff7f0e", "#d62728"])
+
+
+@st.cache_data(max_entries=32)
+def calculer_grille(voiture, param_x, param_y, ecart, resolution, options):
+    voiture = dict(voiture)
+    axes = {p: np.linspace(voiture[p] * (1 - ecart / 100), voiture[p] * (1 + ecart / 100), resolution)
+            for p in (param_x, param_y)}
+    resultats = simuler_grille(voiture, axes, **dict(options))
+    # Bords de chaque case pour dessiner la carte de chaleur
+    for p in (param_x, param_y):
+        pas = axes[p][1] - axes[p][0]
+        resultats[p + "_fin"] = resultats[p] + pas
+    return resultats
+
+
+def carte(resultats, param_x, param_y, couleur):
+    return alt.Chart(resultats).mark_rect().encode(
+        x=alt.X(param_x, title=PARAMETRES[param_x], scale=alt.Scale(zero=False, nice=False)),
+        x2=param_x + "_fin",
+        y=alt.Y(param_y, title=PARAMETRES[param_y], scale=alt.Scale(zero=False, nice=False)),
+        y2=param_y + "_fin",
+        color=couleur,
+    ).properties(width=650, height=500)
+
+
+st.set_page_config(page_title="Balayage", page_icon="🗺️")
+st.title("Balayage des caractéristiques")
+st.write("Chrono total et réussite du circuit quand deux caractéristiques de la voiture varient. "
+         "Toute la grille est simulée en un seul calcul vectorisé.")
+
+catalogue = charger_catalogue()
+voitures = catalogue.tableau()
+tableaux = caracteristiques_voitures(voitures)
+
+nom_voiture = st.selectbox("Sélectionnez le modèle de voiture :", catalogue.noms)
+position = catalogue.position(nom_voiture)
+voiture = {p: float(tableaux[p][position]) for p in PARAMETRES}
+
+col_x, col_y = st.columns(2)
+with col_x:
+    param_x = st.selectbox("Axe horizontal :", list(PARAMETRES), index=5, format_func=PARAMETRES.get)
+with col_y:
+    autres = [p for p in PARAMETRES if p != param_x]
+    param_y = st.selectbox("Axe vertical :", autres, index=autres.index("acceleration") if param_x != "acceleration" else 0,
+                           format_func=PARAMETRES.get)
+ecart = st.slider("Variation autour des valeurs de la voiture (en %) :", 5, 90, 30)
+resolution = st.slider("Nombre de points par axe :", 20, 300, 200, 10)
+
+st.sidebar.subheader("Accessoires")
+options = {option: st.sidebar.toggle(NOMS_OPTIONS[option], value=option == "frottements") for option in OPTIONS}
+
+resultats = calculer_grille(tuple(voiture.items()), param_x, param_y, ecart, resolution, tuple(options.items()))
+
+st.subheader("▪ Chrono total")
+st.altair_chart(carte(resultats[resultats["resultat"] != "CRASH"], param_x, param_y,
+                      alt.Color("temps_total", title="Chrono (s)", scale=alt.Scale(scheme="viridis"))))
+st.caption("Les cases vides correspondent à un crash.")
+
+st.subheader("▪ Zones de réussite et de crash")
+st.altair_chart(carte(resultats, param_x, param_y,
+                      alt.Color("resultat:N", title="Résultat", scale=COULEURS_RESULTAT)))
+
+st.divider()
+st.subheader("▪ Effet d'une variation sur toute la flotte")
+variation = st.number_input(f"Variation de « {PARAMETRES[param_x]} » (en %) :", -90, 90, -5, 1)
+
+# Axe 0 : voitures, axe 1 : référence puis valeur modifiée
+caracteristiques = {p: valeurs[:, None] for p, valeurs in tableaux.items()}
+caracteristiques[param_x] = caracteristiques[param_x] * np.array([1.0, 1 + variation / 100])
+chronos = simuler_lots(**caracteristiques, **options)["temps_total"].reshape(len(voitures), 2)
+st.dataframe(pd.DataFrame({
+    "Voiture": voitures["Nom"],
+    "Chrono de référence (s)": chronos[:, 0],
+    "Chrono modifié (s)": chronos[:, 1],
+    "Gain (s)": chronos[:, 0] - chronos[:, 1],
+}), hide_index=True)
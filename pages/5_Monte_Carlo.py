@@ -0,0 +1,92 @@
+# Incertitude sur le chrono : les caractéristiques des voitures ne sont que des estimations
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import circuits
+from catalogue import COLONNES, charger as charger_catalogue
+from flotte import OPTIONS, caracteristiques_voitures
+from monte_carlo import DISTRIBUTIONS, LOIS, PERCENTILES, analyser, analyser_flotte
+
+PARAMETRES = {parametre: COLONNES[parametre] for parametre in DISTRIBUTIONS}
+NOMS_OPTIONS = {
+    "nos_pente": "NOS dans la pente",
+    "nos_looping": "NOS dans le looping",
+    "nos_piste": "NOS sur la piste",
+    "ailerons": "Système de planage",
+    "frottements": "Avec frottements",
+}
+
+
+@st.cache_data(max_entries=16)
+def calculer(voiture, n, distributions, graine, options):
+    resume, resultats = analyser(dict(voiture), n, dict(distributions), graine, **dict(options))
+    # Tours terminés au sens de Circuit.simuler, comme dans le résumé
+    chronos = resultats["temps_total"][np.asarray(resultats["resultat"]) != "CRASH"]
+    return resume, chronos
+
+
+@st.cache_data(max_entries=4)
+def calculer_flotte(voitures, n, distributions, graine, options):
+    return analyser_flotte(voitures, n, dict(distributions), graine, **dict(options))
+
+
+st.set_page_config(page_title="Monte-Carlo", page_icon="🎲")
+st.title("Incertitude sur le chrono")
+st.write("Les caractéristiques des voitures sont des estimations : on tire au hasard de nombreuses variantes "
+         "de la voiture et on les simule toutes sur le circuit, en un seul calcul vectorisé.")
+
+catalogue = charger_catalogue()
+voitures = catalogue.tableau()
+tableaux = caracteristiques_voitures(voitures)
+
+nom_voiture = st.selectbox("Sélectionnez le modèle de voiture :", catalogue.noms)
+position = catalogue.position(nom_voiture)
+voiture = {p: float(valeurs[position]) for p, valeurs in tableaux.items()}
+voiture["mu"] = catalogue[nom_voiture].mu
+
+n = st.select_slider("Nombre de tirages :", [10_000, 50_000, 100_000, 200_000, 500_000], 100_000)
+graine = st.number_input("Graine du générateur aléatoire :", 0, None, 0)
+
+st.sidebar.subheader("Accessoires")
+options = {option: st.sidebar.toggle(NOMS_OPTIONS[option], value=option == "frottements") for option in OPTIONS}
+
+st.sidebar.subheader("Lois des paramètres")
+distributions = {}
+for parametre, (loi, ecart) in DISTRIBUTIONS.items():
+    col_loi, col_ecart = st.sidebar.columns(2)
+    with col_loi:
+        loi = st.selectbox(PARAMETRES[parametre], LOIS, LOIS.index(loi), key="loi_" + parametre)
+    with col_ecart:
+        ecart = st.number_input("Écart (%)", 0.0, 100.0, 100 * ecart, 1.0, key="ecart_" + parametre) / 100
+    distributions[parametre] = (loi, ecart)
+st.sidebar.caption("Écart-type relatif pour la loi normale, demi-largeur relative pour la loi uniforme.")
+
+resume, chronos = calculer(tuple(voiture.items()), n, tuple(distributions.items()), graine,
+                           tuple(options.items()))
+
+probas = {"Échec du " + cle.removeprefix("proba_echec_"): valeur for cle, valeur in resume.items()
+          if cle.startswith("proba_echec_")}
+probas["Record battu"] = resume["proba_record"]
+for colonne, (titre, proba) in zip(st.columns(len(probas)), probas.items()):
+    colonne.metric(titre, f"{100 * proba:.2f} %")
+
+st.subheader("▪ Chrono des tours sans crash")
+if chronos.size:
+    st.dataframe(pd.DataFrame({"Percentile": [f"{p} %" for p in PERCENTILES],
+                               "Chrono (s)": [resume[f"p{p}"] for p in PERCENTILES]}), hide_index=True)
+    comptes, bords = np.histogram(chronos, bins=60)
+    histogramme = pd.DataFrame({"debut": bords[:-1], "fin": bords[1:], "tirages": comptes})
+    barres = alt.Chart(histogramme).mark_bar().encode(
+        x=alt.X("debut", title="Chrono (s)", scale=alt.Scale(zero=False)), x2="fin", y=alt.Y("tirages", title="Tirages"))
+    record = alt.Chart(pd.DataFrame({"record": [circuits.charger().record]})).mark_rule(color="red").encode(x="record")
+    st.altair_chart((barres + record).properties(width=650))
+else:
+    st.write("Toutes les variantes de la voiture se crashent.")
+
+st.divider()
+st.subheader("▪ Toute la flotte")
+if st.button("ANALYSER toute la flotte"):
+    st.dataframe(calculer_flotte(voitures, n, tuple(distributions.items()), graine, tuple(options.items())),
+                 hide_index=True)
@@ -0,0 +1,138 @@
+# Profilage à la demande d'un calcul complet du circuit
+#
+# Désactivé par défaut, sans aucun coût : le profileur n'est créé que pour le
+# calcul demandé. Chaque capture donne deux fichiers horodatés dans .profils/ :
+#   <nom>-<date>.prof    profil déterministe (cProfile), à ouvrir avec snakeviz ou pstats
+#   <nom>-<date>.folded  piles échantillonnées au format « collapsed », pour flamegraph.pl ou speedscope
+#
+# Exemple :
+#   PROFILAGE=1 streamlit run Hello.py          # ou http://localhost:8501/?profilage=1
+#   python profilage.py --voiture "Mazda RX-7 FD" --frottements
+import argparse
+import cProfile
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_PROFILS = os.environ.get("PROFILAGE_DOSSIER", os.path.join(DOSSIER, ".profils"))
+PROFILAGE = os.environ.get("PROFILAGE", "0") != "0"
+INTERVALLE = 0.001  # Entre deux échantillons de pile (en s)
+
+
+def demande(parametres=None):
+    """Vrai si le profilage est activé par PROFILAGE=1 ou par le paramètre d'URL ?profilage=1."""
+    if PROFILAGE:
+        return True
+    return parametres is not None and parametres.get("profilage", "0") not in ("", "0")
+
+
+def _cadre(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Echantillonneur:
+    """Relève la pile d'un thread à intervalle régulier et compte les piles identiques."""
+
+    def __init__(self, thread=None, intervalle=INTERVALLE):
+        self.thread = thread or threading.get_ident()
+        self.intervalle = intervalle
+        self.piles = collections.Counter()
+        self._arret = threading.Event()
+        self._releveur = threading.Thread(target=self._relever, daemon=True)
+
+    def _relever(self):
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.thread)
+            pile = []
+            while frame is not None:
+                pile.append(_cadre(frame))
+                frame = frame.f_back
+            if pile:
+                self.piles[";".join(reversed(pile))] += 1
+
+    def demarrer(self):
+        self._releveur.start()
+
+    def arreter(self):
+        self._arret.set()
+        self._releveur.join()
+
+    def ecrire(self, chemin):
+        with open(chemin, "w", encoding="utf-8") as fichier:
+            for pile, nombre in self.piles.most_common():
+                fichier.write(f"{pile} {nombre}\n")
+
+
+class Capture:
+    """Fichiers produits par un profilage ; renseignés à la sortie du bloc."""
+
+    def __init__(self, nom):
+        self.nom = nom
+        self.profil = None
+        self.piles = None
+        self.duree = None
+
+
+@contextlib.contextmanager
+def profiler(nom, dossier=DOSSIER_PROFILS):
+    """Profile le bloc : cProfile et échantillonnage des piles du thread courant en même temps.
+
+    Les durées de l'échantillonnage incluent le surcoût de cProfile, qui
+    ralentit surtout les petites fonctions appelées très souvent.
+    """
+    capture = Capture(nom)
+    os.makedirs(dossier, exist_ok=True)
+    base = os.path.join(dossier, f"{''.join(c if c.isalnum() else '_' for c in nom)}-"
+                                 f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    echantillonneur = Echantillonneur()
+    profil = cProfile.Profile()
+    debut = time.perf_counter()
+    echantillonneur.demarrer()
+    profil.enable()
+    try:
+        yield capture
+    finally:
+        profil.disable()
+        echantillonneur.arreter()
+        capture.duree = time.perf_counter() - debut
+        capture.profil, capture.piles = base + ".prof", base + ".folded"
+        profil.dump_stats(capture.profil)
+        echantillonneur.ecrire(capture.piles)
+
+
+def main(arguments=None):
+    import pstats
+
+    import catalogue
+    from tour import Tour
+
+    parser = argparse.ArgumentParser(description="Profile le calcul d'un tour complet, sans Streamlit.")
+    parser.add_argument("--voiture", help="nom de la voiture (la première du catalogue par défaut)")
+    for option in ["nos_pente", "nos_looping", "nos_piste", "ailerons", "frottements"]:
+        parser.add_argument("--" + option, action="store_true")
+    parser.add_argument("--lignes", type=int, default=15, help="fonctions affichées, par temps cumulé")
+    args = parser.parse_args(arguments)
+
+    voitures = catalogue.charger()
+    voiture = voitures[args.voiture] if args.voiture else voitures.voitures[0]
+    options = {o: getattr(args, o) for o in ["nos_pente", "nos_looping", "nos_piste", "ailerons", "frottements"]}
+    # Sans le cache sur disque : on veut voir le calcul, pas la lecture d'un résultat déjà connu
+    with profiler(f"tour-{voiture.nom}") as capture:
+        tour = Tour.calculer(voiture.caracteristiques(), options, cache=None, nom=voiture.nom)
+        for segment in Tour.circuit().segments:
+            if segment.type == "looping":
+                tour.trajectoire_looping(segment.nom)
+            elif segment.type == "ravin":
+                tour.trajectoire_ravin(segment.nom)
+    print(f"{voiture.nom} : {tour.resultat} en {tour.temps_total:.3f} s, calculé en {capture.duree * 1e3:.1f} ms")
+    print(f"Profil : {capture.profil}\nPiles : {capture.piles}")
+    pstats.Stats(capture.profil).sort_stats("cumulative").print_stats(args.lignes)
+
+
+if __name__ == "__main__":
+    main()
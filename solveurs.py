@@ -0,0 +1,431 @@
+# Solveurs des différentes parties du circuit, utilisables sans Streamlit
+import contextlib
+import math as mt
+import threading
+
+import metriques
+
+G = 9.81
+
+# Caractéristiques du circuit
+ANGLE_PENTE = 3.699     # Inclinaison de la pente (en degrés)
+LONGUEUR_PENTE = 31     # Longueur de la pente (en m)
+LONGUEUR_PISTE = 10     # Longueur de la fin de piste (en m)
+RAYON_LOOPING = 6       # Rayon du looping (en m)
+LONGUEUR_RAVIN = 9      # Largeur du ravin à franchir (en m)
+
+SIN_PENTE = mt.sin(mt.radians(ANGLE_PENTE))
+RHO = 1.225             # Masse volumique de l'air (en kg/m³)
+MU = 0.1                # Coefficient de frottement dans le looping
+
+# Accessoires et conditions de réussite
+BONUS_NOS = 1.3         # Multiplicateur d'accélération avec le NOS
+BONUS_CX_AILERONS = 0.95
+BONUS_CZ_AILERONS = 1.1
+MASSE_AILERONS = 45     # Masse ajoutée par le système de planage (en kg)
+V_MIN_RAVIN = 20        # Vitesse minimale pour passer le ravin (en m/s)
+V_MIN_LOOPING = mt.sqrt(G * RAYON_LOOPING)  # Vitesse minimale pour franchir le looping
+RECORD = 8              # Chrono à battre pour tout le circuit (en s)
+
+POINTS_TRAJECTOIRE = 650  # Points calculés quand une trajectoire est demandée pour un graphique
+
+# Réglages de l'intégrateur adaptatif utilisé avec frottements
+RTOL = 1e-8
+ATOL = 1e-8
+T_MAX = 120             # Durée maximale simulée pour un segment (en s)
+
+_suivi = threading.local()
+
+
+@contextlib.contextmanager
+def suivre(rappel):
+    """Pendant le bloc, les segments intégrés pas à pas dans ce thread appellent rappel(fraction parcourue)."""
+    precedent = getattr(_suivi, "rappel", None)
+    _suivi.rappel = rappel
+    try:
+        yield
+    finally:
+        _suivi.rappel = precedent
+
+
+def facteur_trainee(L, h):
+    """Facteur 1/2 ρ S de la traînée (S = L h, surface frontale) : k = facteur * Cx et F = k v²."""
+    return 0.5 * RHO * L * h
+
+
+def temps_parcours(a, v_initial, distance):
+    """Temps pour parcourir `distance` avec une accélération constante `a`."""
+    # Racine positive de 0.5*a*t² + v0*t - d = 0, écrite sous la forme
+    # 2d / (v0 + sqrt(v0² + 2ad)) pour rester exacte quand a tend vers 0
+    discriminant = v_initial * v_initial + 2 * a * distance
+    if discriminant < 0:
+        return mt.inf  # La voiture s'arrête avant la fin du segment
+    denominateur = v_initial + mt.sqrt(discriminant)
+    if denominateur <= 0:
+        return mt.inf
+    return 2 * distance / denominateur
+
+
+def vitesse_pente(g, masse, acceleration, methode="analytique"):
+    if methode == "pas":
+        return vitesse_pente_pas(g, masse, acceleration)
+    a = g * SIN_PENTE + acceleration
+    t = temps_parcours(a, 0, LONGUEUR_PENTE)
+    if t == mt.inf:
+        return 0.0, t
+    return a * t, t
+
+
+def vitesse_piste(g, masse, acceleration, v_initial, methode="analytique"):
+    if methode == "pas":
+        return vitesse_piste_pas(g, masse, acceleration, v_initial)
+    t = temps_parcours(acceleration, v_initial, LONGUEUR_PISTE)
+    if t == mt.inf:
+        return 0.0, t
+    return acceleration * t + v_initial, t
+
+
+# Coefficients de Dormand-Prince 5(4)
+C2, C3, C4, C5 = 1 / 5, 3 / 10, 4 / 5, 8 / 9
+A21 = 1 / 5
+A31, A32 = 3 / 40, 9 / 40
+A41, A42, A43 = 44 / 45, -56 / 15, 32 / 9
+A51, A52, A53, A54 = 19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729
+A61, A62, A63, A64, A65 = 9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656
+B1, B3, B4, B5, B6 = 35 / 384, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84
+E1, E3, E4, E5, E6, E7 = 71 / 57600, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40
+
+
+def pas_dopri(f, t, y0, y1, h, k1):
+    """Un pas de Dormand-Prince pour un système à deux inconnues."""
+    a1, b1 = k1
+    a2, b2 = f(t + C2 * h, y0 + h * A21 * a1, y1 + h * A21 * b1)
+    a3, b3 = f(t + C3 * h, y0 + h * (A31 * a1 + A32 * a2), y1 + h * (A31 * b1 + A32 * b2))
+    a4, b4 = f(t + C4 * h, y0 + h * (A41 * a1 + A42 * a2 + A43 * a3),
+               y1 + h * (A41 * b1 + A42 * b2 + A43 * b3))
+    a5, b5 = f(t + C5 * h, y0 + h * (A51 * a1 + A52 * a2 + A53 * a3 + A54 * a4),
+               y1 + h * (A51 * b1 + A52 * b2 + A53 * b3 + A54 * b4))
+    a6, b6 = f(t + h, y0 + h * (A61 * a1 + A62 * a2 + A63 * a3 + A64 * a4 + A65 * a5),
+               y1 + h * (A61 * b1 + A62 * b2 + A63 * b3 + A64 * b4 + A65 * b5))
+    z0 = y0 + h * (B1 * a1 + B3 * a3 + B4 * a4 + B5 * a5 + B6 * a6)
+    z1 = y1 + h * (B1 * b1 + B3 * b3 + B4 * b4 + B5 * b5 + B6 * b6)
+    k7 = f(t + h, z0, z1)
+    e0 = h * (E1 * a1 + E3 * a3 + E4 * a4 + E5 * a5 + E6 * a6 + E7 * k7[0])
+    e1 = h * (E1 * b1 + E3 * b3 + E4 * b4 + E5 * b5 + E6 * b6 + E7 * k7[1])
+    return z0, z1, e0, e1, k7
+
+
+def integrer(f, y0, y1, evenements, t_max=T_MAX, rtol=RTOL, atol=ATOL, h_max=mt.inf, points=None, avancement=None):
+    """Intègre (y0, y1)' = f(t, y0, y1) avec un pas adaptatif jusqu'au
+    premier événement terminal.
+
+    Chaque événement est une fonction e(t, y0, y1) qui déclenche l'arrêt
+    quand elle passe de négative à positive ; l'instant est ensuite affiné
+    par la méthode d'Illinois sur la longueur du dernier pas.
+    Si `points` est une liste, chaque pas accepté y ajoute (t, y0, y1) ;
+    `h_max` borne alors la durée d'un pas pour garder une courbe lisse.
+    Sous solveurs.suivre, chaque pas accepté transmet avancement(t, y0, y1),
+    la fraction du segment déjà parcourue.
+    Renvoie (indice de l'événement ou None, t, y0, y1, évaluations de f).
+    """
+    t = 0.0
+    h = min(1e-3, h_max)
+    if points is not None:
+        points.append((t, y0, y1))
+    k1 = f(t, y0, y1)
+    nfev = 1
+    valeurs = [e(t, y0, y1) for e in evenements]
+    rappel = getattr(_suivi, "rappel", None) if avancement is not None else None
+    while t < t_max:
+        h = min(h, t_max - t)
+        z0, z1, e0, e1, k7 = pas_dopri(f, t, y0, y1, h, k1)
+        nfev += 6
+        s0 = atol + rtol * max(abs(y0), abs(z0))
+        s1 = atol + rtol * max(abs(y1), abs(z1))
+        erreur = mt.sqrt(0.5 * ((e0 / s0) ** 2 + (e1 / s1) ** 2))
+        if erreur > 1:
+            h *= max(0.2, 0.9 * erreur ** -0.2)
+            continue
+
+        nouvelles = [e(t + h, z0, z1) for e in evenements]
+        for i, (avant, apres) in enumerate(zip(valeurs, nouvelles)):
+            if avant < 0 <= apres:
+                # Recherche de la durée de pas qui annule l'événement
+                bas, haut, e_bas, e_haut = 0.0, h, avant, apres
+                cote = 0
+                for _ in range(60):
+                    s = (bas * e_haut - haut * e_bas) / (e_haut - e_bas)
+                    u0, u1, _e0, _e1, _k = pas_dopri(f, t, y0, y1, s, k1)
+                    nfev += 6
+                    e_s = evenements[i](t + s, u0, u1)
+                    if e_s < 0:
+                        bas, e_bas = s, e_s
+                        if cote == -1:
+                            e_haut *= 0.5
+                        cote = -1
+                    else:
+                        haut, e_haut = s, e_s
+                        if cote == 1:
+                            e_bas *= 0.5
+                        cote = 1
+                    if haut - bas <= 1e-14 * (1 + t) or e_s == 0:
+                        break
+                if points is not None:
+                    points.append((t + s, u0, u1))
+                metriques.compter_evaluations(nfev)
+                return i, t + s, u0, u1, nfev
+
+        t += h
+        y0, y1, k1 = z0, z1, k7
+        valeurs = nouvelles
+        if points is not None:
+            points.append((t, y0, y1))
+        if rappel is not None:
+            rappel(avancement(t, y0, y1))
+        h = min(h * (min(5.0, 0.9 * erreur ** -0.2) if erreur > 0 else 5.0), h_max)
+    metriques.compter_evaluations(nfev)
+    return None, t, y0, y1, nfev
+
+
+def integrer_segment(a0, k_sur_m, v_initial, distance, rtol=RTOL, atol=ATOL):
+    """Intègre dv/dt = a0 - (k/m) v² jusqu'à avoir parcouru `distance`."""
+    def derivees(t, v, OM):
+        return a0 - k_sur_m * v * v, v
+
+    def fin_segment(t, v, OM):
+        return OM - distance
+
+    def arret_voiture(t, v, OM):
+        return -v
+
+    evenement, t, v, OM, nfev = integrer(derivees, v_initial, 0.0, (fin_segment, arret_voiture),
+                                         rtol=rtol, atol=atol, avancement=lambda t, v, OM: OM / distance)
+    if evenement != 0:
+        return 0.0, mt.inf  # La voiture n'atteint jamais la fin du segment
+    return v, t
+
+
+def vitesse_pente_frottement(g, masse, acceleration, l, L, h, Cx, methode="adaptative", rtol=RTOL, atol=ATOL,
+                             noyau=None):
+    if methode == "euler":
+        return vitesse_pente_frottement_euler(g, masse, acceleration, l, L, h, Cx, noyau)
+    k = facteur_trainee(L, h) * Cx
+    a0 = g * SIN_PENTE + acceleration - 0.1 * (g * SIN_PENTE)
+    return integrer_segment(a0, k / masse, 0.0, LONGUEUR_PENTE, rtol, atol)
+
+
+def vitesse_piste_frottement(g, masse, acceleration, v_initial, l, L, h, Cx, methode="adaptative", rtol=RTOL, atol=ATOL,
+                             noyau=None):
+    if methode == "euler":
+        return vitesse_piste_frottement_euler(g, masse, acceleration, v_initial, l, L, h, Cx, noyau)
+    k = facteur_trainee(L, h) * Cx
+    a0 = acceleration - 0.1 * g
+    return integrer_segment(a0, k / masse, v_initial, LONGUEUR_PISTE, rtol, atol)
+
+
+def integrer_looping(theta_ddot, v_initial, trajectoire, rtol, atol, rayon=RAYON_LOOPING):
+    """Intègre le looping jusqu'à theta = 2π, ou jusqu'à ce que la voiture cale."""
+    r = rayon
+
+    def derivees(t, theta, theta_dot):
+        return theta_dot, theta_ddot(theta, theta_dot)
+
+    def sortie_looping(t, theta, theta_dot):
+        return theta - 2 * mt.pi
+
+    def calage(t, theta, theta_dot):
+        return -theta_dot
+
+    points = [] if trajectoire is not None else None
+    evenement, t, theta, theta_dot, nfev = integrer(
+        derivees, 0.0, v_initial / r, (sortie_looping, calage),
+        rtol=rtol, atol=atol, h_max=0.005 if points is not None else mt.inf, points=points,
+        avancement=lambda t, theta, theta_dot: theta / (2 * mt.pi))
+    if points is not None:
+        trajectoire.extend((p[1], r * p[2]) for p in points)
+    if evenement != 0:
+        return 0.0, t  # La voiture cale avant la sortie du looping
+    return r * theta_dot, t
+
+
+def vitesse_looping(g, masse, acceleration, v_initial, trajectoire=None, rtol=RTOL, atol=ATOL, rayon=RAYON_LOOPING):
+    """Vitesse et temps en sortie du looping.
+
+    Si `trajectoire` est une liste, elle est remplie avec les couples
+    (theta, vitesse) utilisés pour tracer la courbe.
+    """
+    r = rayon
+
+    def theta_ddot(theta, theta_dot):
+        return (-masse * g * mt.sin(theta) - 0.5 * (r * theta_dot ** 2) - (r * (theta_dot ** 2)) + acceleration) / (masse * r)
+
+    return integrer_looping(theta_ddot, v_initial, trajectoire, rtol, atol, rayon)
+
+
+def vitesse_looping_frottement(g, masse, acceleration, v_initial, mu, rho, Cx, L, h, trajectoire=None, rtol=RTOL, atol=ATOL,
+                               rayon=RAYON_LOOPING):
+    r = rayon
+    Sx = L * h
+
+    def theta_ddot(theta, theta_dot):
+        return (-masse * g * mt.sin(theta) - 0.5 * Cx * rho * Sx * (r * theta_dot ** 2) - mu * (r * (theta_dot ** 2)) + acceleration) / (masse * r)
+
+    return integrer_looping(theta_ddot, v_initial, trajectoire, rtol, atol, rayon)
+
+
+def position_ravin(t, v_initial, g, kx, ky, y_initial):
+    """Position (x, y) de la voiture au-dessus du ravin à l'instant t.
+
+    kx et ky sont les coefficients de traînée divisés par la masse.
+    """
+    # Horizontal : dvx/dt = -kx vx², donc x(t) = ln(1 + kx v0 t) / kx
+    x = mt.log1p(kx * v_initial * t) / kx if kx > 0 else v_initial * t
+    # Vertical : dvy/dt = -g - ky vy² avec vy(0) = 0, donc y(t) = y0 + ln(cos(sqrt(g ky) t)) / ky
+    if ky > 0:
+        cosinus = mt.cos(mt.sqrt(g * ky) * t)
+        y = y_initial + mt.log(cosinus) / ky if cosinus > 0 else -mt.inf
+    else:
+        y = y_initial - 0.5 * g * t**2
+    return x, y
+
+
+def saut_ravin(v_initial, g, kx, ky, y_initial, trajectoire, longueur=LONGUEUR_RAVIN):
+    # x(t) = longueur s'inverse directement : t = (exp(longueur kx) - 1) / (kx v0)
+    if kx > 0:
+        temps = mt.expm1(kx * longueur) / (kx * v_initial)
+        v_x = v_initial * mt.exp(-kx * longueur)
+    else:
+        temps = longueur / v_initial
+        v_x = v_initial
+    # La trajectoire n'est échantillonnée que si un graphique la demande
+    if trajectoire is not None:
+        n = POINTS_TRAJECTOIRE
+        trajectoire.extend(position_ravin(temps * i / (n - 1), v_initial, g, kx, ky, y_initial) for i in range(n))
+    return v_x, temps
+
+
+def vitesse_ravin(v_initial, trajectoire=None, methode="analytique", longueur=LONGUEUR_RAVIN):
+    """Vitesse et temps de saut au-dessus du ravin.
+
+    Si `trajectoire` est une liste, elle est remplie avec les couples
+    (longueur, hauteur) de la trajectoire.
+    """
+    if methode == "pas":
+        return vitesse_ravin_pas(v_initial, trajectoire)
+    if v_initial <= 0:
+        return 0.0, 0.0
+    return saut_ravin(v_initial, G, 0.0, 0.0, 0.0, trajectoire, longueur)
+
+
+def vitesse_ravin_frottement(v_initial, g, masse, l, L, h, Cx, Cz, trajectoire=None, methode="analytique",
+                             longueur=LONGUEUR_RAVIN, noyau=None):
+    if methode == "euler":
+        return vitesse_ravin_frottement_euler(v_initial, g, masse, l, L, h, Cx, Cz, trajectoire, noyau)
+    if v_initial <= 0:
+        return 0.0, 0.0
+    kx = 0.5 * (RHO * l * h * Cx) / masse
+    ky = 0.5 * (RHO * L * l * Cz) / masse
+    return saut_ravin(v_initial, g, kx, ky, 1.0, trajectoire, longueur)
+
+
+def appliquer_options(masse, acceleration, Cx, Cz, nos_pente=False, nos_looping=False, nos_piste=False,
+                      ailerons=False):
+    """Masse, accélération de chaque partie, Cx et Cz une fois les accessoires pris en compte."""
+    masse = int(masse)
+    acceleration_pente = acceleration * BONUS_NOS if nos_pente else acceleration
+    acceleration_looping = acceleration * BONUS_NOS if nos_looping else acceleration
+    acceleration_piste = acceleration * BONUS_NOS if nos_piste else acceleration
+    if ailerons:
+        Cz = Cz * BONUS_CZ_AILERONS
+        Cx = Cx * BONUS_CX_AILERONS
+        masse = masse + MASSE_AILERONS
+    return masse, acceleration_pente, acceleration_looping, acceleration_piste, Cx, Cz
+
+
+def simuler_circuit(masse, acceleration, l, L, h, Cx, Cz, nos_pente=False, nos_looping=False, nos_piste=False,
+                    ailerons=False, frottements=False, cache=None):
+    """Tour complet du circuit décrit dans circuits.FICHIER_CIRCUIT, comme calculer_all.
+
+    Renvoie v_<segment> et temps_<segment> pour chaque segment, puis
+    temps_total et resultat (voir circuits.Circuit.simuler). Si `cache` est
+    donné (voir cache_resultats), les segments calculés par intégration
+    passent par ce cache ; le ravin est toujours recalculé.
+    """
+    # circuits importe ce module : import au premier appel
+    import circuits
+
+    return circuits.charger().simuler(masse, acceleration, l, L, h, Cx, Cz, nos_pente=nos_pente,
+                                      nos_looping=nos_looping, nos_piste=nos_piste, ailerons=ailerons,
+                                      frottements=frottements, cache=cache)
+
+
+# Anciennes versions par pas de temps, gardées pour comparer les résultats
+def vitesse_pente_pas(g, masse, acceleration):
+    OM = 0
+    t = 0
+    while OM < LONGUEUR_PENTE:
+        OM = 0.5 * (g * mt.sin(mt.radians(ANGLE_PENTE)) + acceleration ) * t**2
+        t = t + 0.001
+    v = (g * mt.sin(mt.radians(ANGLE_PENTE)) +  acceleration ) * t
+    return v,t
+
+
+def vitesse_piste_pas(g, masse, acceleration, v_initial):
+    OM = 0
+    t = 0
+    while OM < LONGUEUR_PISTE:
+        OM = 0.5 * (acceleration) * t**2 + v_initial*t
+        t = t + 0.0001
+    v = acceleration * t + v_initial
+    return v,t
+
+
+def vitesse_pente_frottement_euler(g, masse, acceleration, l, L, h, Cx, noyau=None):
+    # Les noyaux (numpy, Numba) ne sont importés que par ces anciennes méthodes
+    import noyaux
+
+    k = facteur_trainee(L, h) * Cx
+    return noyaux.noyau(noyau)["segment"](g * SIN_PENTE, float(acceleration), 0.1 * (g * SIN_PENTE), k, float(masse),
+                                          0.0, float(LONGUEUR_PENTE), 0.00001)
+
+
+def vitesse_piste_frottement_euler(g, masse, acceleration, v_initial, l, L, h, Cx, noyau=None):
+    import noyaux
+
+    k = facteur_trainee(L, h) * Cx
+    return noyaux.noyau(noyau)["segment"](0.0, float(acceleration), 0.1 * g, k, float(masse), float(v_initial),
+                                          float(LONGUEUR_PISTE), 0.00001)
+
+
+def vitesse_ravin_pas(v_initial, trajectoire=None):
+    if v_initial <= 0:
+        return 0.0, 0.0
+    temps = 0
+    x = 0
+    while x < LONGUEUR_RAVIN:
+        x = v_initial * temps
+        if trajectoire is not None:
+            trajectoire.append((x, 0.5 * -G * temps**2))
+        temps += 0.0001
+    return v_initial, temps
+
+
+def vitesse_ravin_frottement_euler(v_initial, g, masse, l, L, h, Cx, Cz, trajectoire=None, noyau=None):
+    if v_initial <= 0:
+        return 0.0, 0.0
+    import numpy as np
+    import noyaux
+
+    fonctions = noyaux.noyau(noyau)
+    kx = (0.5 * (RHO * l * h * Cx))
+    ky = (0.5 * (RHO * L * l * Cz))
+    # Le noyau compilé n'est spécialisé que pour des float
+    parametres = (float(v_initial), float(g), float(masse), kx, ky, 1.0, float(LONGUEUR_RAVIN), 0.0001)
+    vide = np.empty(0)
+    v_x, temps, n = fonctions["ravin"](*parametres, vide, vide)
+    if trajectoire is not None:
+        # Deuxième passage avec des tableaux de la bonne taille pour garder les positions
+        xs, ys = np.empty(n), np.empty(n)
+        fonctions["ravin"](*parametres, xs, ys)
+        trajectoire.extend(zip(xs.tolist(), ys.tolist()))
+    return v_x, temps
@@ -0,0 +1,116 @@
+# Tour complet du circuit : calculé une seule fois, puis affiché à la demande
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+import circuits
+import metriques
+import solveurs
+from cache_resultats import CACHE
+from solveurs import G, MU, RHO, appliquer_options
+
+
+@dataclass
+class Tour:
+    """Vitesses et chronos d'un tour complet pour une voiture et des options.
+
+    `vitesses` et `temps` donnent, pour chaque segment du circuit (par son
+    nom, dans l'ordre du circuit), la vitesse en sortie et la durée. Les
+    trajectoires, qui ne servent qu'aux graphiques, ne sont calculées qu'à
+    la première demande puis gardées avec le tour.
+    """
+    voiture: dict
+    options: dict
+    vitesses: dict
+    temps: dict
+    temps_total: float
+    resultat: str
+    _trajectoires: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def calculer(cls, voiture, options, cache=CACHE, nom=None):
+        for _, _, resultats in cls.etapes(voiture, options, cache, nom):
+            pass
+        return cls.depuis_resultats(voiture, options, resultats)
+
+    @classmethod
+    def depuis_resultats(cls, voiture, options, resultats):
+        """Tour construit à partir des résultats de Circuit.simuler (v_<segment>, temps_<segment>…)."""
+        segments = cls.circuit().segments
+        return cls(dict(voiture), dict(options), {s.nom: resultats["v_" + s.nom] for s in segments},
+                   {s.nom: resultats["temps_" + s.nom] for s in segments}, resultats["temps_total"],
+                   resultats["resultat"])
+
+    @staticmethod
+    def etapes(voiture, options, cache=CACHE, nom=None, suivi=None):
+        """Générateur : (segment, avancement entre 0 et 1, résultats partiels) dès qu'une partie est calculée.
+
+        Après la dernière partie, Tour.depuis_resultats(voiture, options, resultats)
+        donne le tour complet. `nom` identifie la voiture dans les mesures de
+        performance ; `suivi(segment, avancement)` suit l'avancement pendant
+        le calcul d'une partie (voir Circuit.etapes).
+        """
+        return Tour.circuit().etapes(**voiture, **options, cache=cache, voiture=nom, suivi=suivi)
+
+    @staticmethod
+    def circuit():
+        """Circuit compilé sur lequel les tours sont calculés."""
+        return circuits.charger()
+
+    def correspond(self, voiture, options):
+        """Vrai si le tour a été calculé pour cette voiture et ces options."""
+        return self.voiture == dict(voiture) and self.options == dict(options)
+
+    def _parametres(self):
+        return appliquer_options(self.voiture["masse"], self.voiture["acceleration"], self.voiture["Cx"],
+                                 self.voiture["Cz"], self.options.get("nos_pente", False),
+                                 self.options.get("nos_looping", False), self.options.get("nos_piste", False),
+                                 self.options.get("ailerons", False))
+
+    def entree(self, nom):
+        """Vitesse de la voiture en entrant dans le segment `nom` (0 pour le premier)."""
+        v = 0.0
+        for segment, v_sortie in self.vitesses.items():
+            if segment == nom:
+                return v
+            v = v_sortie
+        raise KeyError(f"Pas de segment {nom!r} dans le tour")
+
+    def trajectoire_looping(self, nom):
+        """Vitesse de la voiture en fonction de theta dans le looping `nom`."""
+        if nom not in self._trajectoires:
+            masse, _, acceleration, _, Cx, _ = self._parametres()
+            segment = self.circuit().segment(nom)
+            rayon = segment.parametres["rayon"]
+            v_entree = self.entree(nom)
+            trajectoire = []
+            with metriques.mesurer(segment.nom, segment.type, None, operation="trajectoire") as details:
+                if self.options.get("frottements"):
+                    CACHE.appeler(solveurs.vitesse_looping_frottement, G, masse, acceleration, v_entree, MU, RHO,
+                                  Cx, self.voiture["L"], self.voiture["h"], rayon=rayon, trajectoire=trajectoire)
+                else:
+                    CACHE.appeler(solveurs.vitesse_looping, G, masse, acceleration, v_entree, rayon=rayon,
+                                  trajectoire=trajectoire)
+                details["points"] = len(trajectoire)
+            self._trajectoires[nom] = pd.DataFrame(trajectoire, columns=["Theta", "Vitesse de la voiture"])
+        return self._trajectoires[nom]
+
+    def trajectoire_ravin(self, nom):
+        """Trajectoire (longueur, hauteur) au-dessus du ravin `nom` ; vide si la voiture n'y arrive pas."""
+        if nom not in self._trajectoires:
+            masse, _, _, _, Cx, Cz = self._parametres()
+            segment = self.circuit().segment(nom)
+            longueur = segment.parametres["longueur"]
+            v_entree = self.entree(nom)
+            trajectoire = []
+            if v_entree > 0:
+                with metriques.mesurer(segment.nom, segment.type, None, operation="trajectoire") as details:
+                    if self.options.get("frottements"):
+                        solveurs.vitesse_ravin_frottement(v_entree, G, masse, self.voiture["l"], self.voiture["L"],
+                                                          self.voiture["h"], Cx, Cz, longueur=longueur,
+                                                          trajectoire=trajectoire)
+                    else:
+                        solveurs.vitesse_ravin(v_entree, longueur=longueur, trajectoire=trajectoire)
+                    details["points"] = len(trajectoire)
+            self._trajectoires[nom] = pd.DataFrame(trajectoire, columns=["Longueur", "Hauteur"])
+        return self._trajectoires[nom]